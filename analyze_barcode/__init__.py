@@ -1,19 +1,22 @@
 import logging
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
-import cv2
 import numpy as np
-import zxingcpp
 
-from shared_code.storage_util import download_bytes, upload_bytes
+from shared_code.artifacts import LAZY_ARTIFACTS, crop, render_barcode_overlay
+from shared_code.barcode_decode import decode_tiered, formats_for
+from shared_code.geometry import to_original_box
+from shared_code.image_codec import decode_gray
+from shared_code.roi_templates import pixel_region
+from shared_code.storage_util import download_bytes, upload_image
 
 logger = logging.getLogger(__name__)
 
 
 def _np_from_image_bytes(img_bytes: bytes) -> np.ndarray:
-    arr = np.frombuffer(img_bytes, dtype=np.uint8)
-    img = cv2.imdecode(arr, cv2.IMREAD_COLOR)  # always BGR (3 channels)
-    return img
+    # The input is the to_grayscale output: decode straight to one channel
+    return decode_gray(img_bytes)
 
 
 def _extract_xy(p):
@@ -57,14 +60,54 @@ def _clamp_bbox_to_image(bbox, width, height):
     return [x, y, w, h]
 
 
-def _png_bytes(img_bgr: np.ndarray) -> bytes:
-    ok, buf = cv2.imencode(".png", img_bgr)
-    if not ok:
-        raise RuntimeError("Failed to encode PNG")
-    return buf.tobytes()
+def _describe(r, factor, offset, region, width, height) -> dict:
+    """Content, symbology and clamped box [x,y,w,h] of one ZXing result."""
+    decoded_value = r.text if getattr(r, "text", None) else None
+    symbology = r.format.name if getattr(r, "format", None) else None
 
+    # zxingcpp.Position is not iterable; extract corners explicitly
+    pos = getattr(r, "position", None)
+    if pos is not None:
+        # Expected attributes: top_left, top_right, bottom_right, bottom_left
+        corners = [pos.top_left, pos.top_right, pos.bottom_right, pos.bottom_left]
+        # Positions are in the (possibly downscaled) image the tier decoded
+        bbox = to_original_box(_bbox_from_corners(corners), factor)
+        bbox[0] += offset[0]
+        bbox[1] += offset[1]
+    else:
+        # If no corners available, estimate using the searched area
+        bbox = region or [0, 0, width, height]
 
-def _no_barcode():
+    return {
+        "decodedValue": decoded_value,
+        "barcodeSymbology": symbology,
+        "barcodeBox": _clamp_bbox_to_image(bbox, width, height),
+    }
+
+
+def _upload_artifacts(gray: np.ndarray, barcodes: list[dict]) -> dict:
+    """
+    Draws one overlay with every box (single pass) and uploads it together
+    with one ROI per barcode in parallel (format per output codec policy).
+    ROIs are views of the gray plane. Sets bc["roiBlob"]; returns the overlay ref.
+    """
+    overlay = render_barcode_overlay(gray, [bc["barcodeBox"] for bc in barcodes])
+    uid = str(uuid.uuid4())
+    jobs = [("output", f"final/barcode/overlay/{uid}", overlay)]
+    for i, bc in enumerate(barcodes):
+        jobs.append(
+            ("output", f"final/barcode/roi/{uid}-{i}", crop(gray, bc["barcodeBox"]))
+        )
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        names = list(pool.map(lambda job: upload_image(*job), jobs))
+    overlay_blob, roi_blobs = names[0], names[1:]
+    for bc, roi_blob in zip(barcodes, roi_blobs):
+        bc["roiBlob"] = {"container": "output", "blobName": roi_blob}
+    logger.info("uploaded overlay=%s rois=%s", overlay_blob, roi_blobs)
+    return {"container": "output", "blobName": overlay_blob}
+
+
+def _no_barcode(tiers: list | None = None):
     return {
         "barcodeData": {
             "barcodeDetected": False,
@@ -72,6 +115,11 @@ def _no_barcode():
             "decodedValue": None,
             "barcodeSymbology": None,
             "barcodeBox": None,
+            "barcodeBoxOriginal": None,
+            "barcodes": [],
+            "searchRegion": None,
+            "decodeTier": None,
+            "decodeTiers": tiers or [],
         },
         "barcodeOverlayBlob": None,
         "barcodeRoiBlob": None,
@@ -80,7 +128,13 @@ def _no_barcode():
 
 def main(ref: dict) -> dict:
     """
-    Expected input: {"container": "...", "blobName": "..."} (output from to_grayscale)
+    Expected input: {"container": "...", "blobName": "...", "scale"?: float, "roi"?: [x0,y0,x1,y1]} (output from to_grayscale)
+    "scale" is working/original resolution (normalize_input); barcodeBoxOriginal
+    is barcodeBox mapped back to the uploaded image. "roi" is the relative
+    barcode region of the product template (load_roi_template) and "roiCodes"
+    the fewest codes full-frame runs decoded (fewer in the crop means a miss,
+    so the full frame is read). "prodCode"
+    selects the symbologies tried first (see shared_code/barcode_decode).
     Output:{
         "barcodeData": {
             "barcodeDetected": bool,
@@ -88,9 +142,15 @@ def main(ref: dict) -> dict:
             "decodedValue": str | None,
             "barcodeSymbology": str | None,
             "barcodeBox": [x,y,w,h] | None,
+            "barcodeBoxOriginal": [x,y,w,h] | None,
+            "barcodes": [{"decodedValue", "barcodeSymbology", "barcodeBox",
+                          "barcodeBoxOriginal", "roiBlob"}],  # every code decoded
+            "searchRegion": [x,y,w,h] | None,
+            "decodeTier": "located" | "fast" | "full" | "harder" | None,
+            "decodeTiers": [{"tier", "hit", "latencyMs"}],
         },
-        "barcodeOverlayBlob": {"container":"output","blobName":"final/barcode/overlay/<uuid>.png"} | None,
-        "barcodeRoiBlob": {"container":"output","blobName":"final/barcode/roi/<uuid>.png"} | None,
+        "barcodeOverlayBlob": {"container":"output","blobName":"final/barcode/overlay/<uuid>.<ext>"} | None,
+        "barcodeRoiBlob": {"container":"output","blobName":"final/barcode/roi/<uuid>.<ext>"} | None,
     }
     """
     try:
@@ -99,18 +159,13 @@ def main(ref: dict) -> dict:
         # 1) Download grayscale image (post to_grayscale)
         img_bytes = download_bytes(ref["container"], ref["blobName"])
         logger.info("downloaded bytes=%d", len(img_bytes))
-        img = _np_from_image_bytes(img_bytes)
-        if img is None:
+        gray = _np_from_image_bytes(img_bytes)
+        del img_bytes
+        if gray is None:
             logger.error("imdecode returned None")
             return _no_barcode()
-        logger.info(
-            "img shape=%s dtype=%s",
-            getattr(img, "shape", None),
-            getattr(img, "dtype", None),
-        )
 
-        # 2) Convert to grayscale for ZXing (usually better for 1D) + ensure contiguous uint8 array
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        # 2) ZXing needs a contiguous uint8 plane (imdecode already gives one)
         if gray.dtype != np.uint8:
             gray = gray.astype(np.uint8)
         if not gray.flags["C_CONTIGUOUS"]:
@@ -121,8 +176,25 @@ def main(ref: dict) -> dict:
             gray.flags["C_CONTIGUOUS"],
         )
 
-        # 3) Read barcodes with ZXing
-        results = zxingcpp.read_barcodes(gray)
+        # 3) Read barcodes with ZXing, first inside the learned per-product
+        #    region (load_roi_template), then on the full frame when the crop
+        #    decodes fewer codes than full-frame runs of the product did
+        h, w = gray.shape[:2]
+        region = pixel_region(ref.get("roi"), w, h)
+        offset = (0, 0)
+        formats = formats_for(ref.get("prodCode"))
+        results, tier, tiers = [], None, []
+        if region is not None:
+            rx, ry, rw, rh = region
+            results, tier, tiers = decode_tiered(
+                gray[ry : ry + rh, rx : rx + rw], formats
+            )
+            offset = (rx, ry)
+            logger.info("zxing template region=%s count=%d", region, len(results))
+        if len(results) < max(1, ref.get("roiCodes") or 1):
+            region, offset = None, (0, 0)
+            results, tier, full_tiers = decode_tiered(gray, formats)
+            tiers += full_tiers
         logger.info(
             "zxing results count=%d",
             len(results) if results is not None else -1,
@@ -130,66 +202,54 @@ def main(ref: dict) -> dict:
         if not results:
             # No detection
             logger.info("no barcode detected")
-            return _no_barcode()
+            return _no_barcode(tiers)
 
-        # 4) Take the first one (simple case)
-        r = results[0]
-        decoded_value = r.text if getattr(r, "text", None) else None
-        symbology = r.format.name if getattr(r, "format", None) else None
-
-        # zxingcpp.Position is not iterable; extract corners explicitly
-        pos = getattr(r, "position", None)
-        corners = None
-        if pos is not None:
-            # Expected attributes: top_left, top_right, bottom_right, bottom_left
-            corners = [pos.top_left, pos.top_right, pos.bottom_right, pos.bottom_left]
-        logger.info(
-            "decoded='%s' symbology=%s corners_ok=%s",
-            decoded_value,
-            symbology,
-            corners is not None,
-        )
+        # 4) Describe every decoded barcode (box in working-image coordinates)
+        barcodes = [
+            _describe(r, factor, (offset[0] + dx, offset[1] + dy), region, w, h)
+            for r, factor, (dx, dy) in results
+        ]
+        scale = ref.get("scale", 1.0)
+        for bc in barcodes:
+            bc["barcodeBoxOriginal"] = to_original_box(bc["barcodeBox"], scale)
+            logger.info(
+                "decoded='%s' symbology=%s bbox=%s",
+                bc["decodedValue"],
+                bc["barcodeSymbology"],
+                bc["barcodeBox"],
+            )
 
-        # If no corners available, estimate using the full frame
-        if corners:
-            bbox = _bbox_from_corners(corners)
+        # 5) + 6) Overlay and ROIs, unless they are rendered on demand
+        #    (PIPELINE_LAZY_ARTIFACTS; see shared_code/artifacts)
+        overlay_ref = None
+        if LAZY_ARTIFACTS:
+            for bc in barcodes:
+                bc["roiBlob"] = None
         else:
-            h, w = gray.shape[:2]
-            bbox = [0, 0, w, h]
-
-        h, w = gray.shape[:2]
-        x, y, bw, bh = _clamp_bbox_to_image(bbox, w, h)
-        logger.info("bbox=%s", (x, y, bw, bh))
-
-        # 5) Create overlay (rectangle drawn)
-        overlay = img.copy()
-        cv2.rectangle(overlay, (x, y), (x + bw, y + bh), (0, 255, 0), thickness=2)
-
-        # 6) Create ROI (crop)
-        roi = img[y : y + bh, x : x + bw]
-
-        # 7) Upload both blobs
-        uid = str(uuid.uuid4())
-        overlay_blob = f"final/barcode/overlay/{uid}.png"
-        roi_blob = f"final/barcode/roi/{uid}.png"
-
-        upload_bytes("output", overlay_blob, _png_bytes(overlay), "image/png")
-        upload_bytes("output", roi_blob, _png_bytes(roi), "image/png")
-        logger.info("uploaded overlay=%s roi=%s", overlay_blob, roi_blob)
+            overlay_ref = _upload_artifacts(gray, barcodes)
 
-        # 8) Build output
+        # 7) Build output. Top-level fields describe the first barcode (as
+        #    before); validation may pick another one from "barcodes".
+        first = barcodes[0]
         out = {
             "barcodeData": {
                 "barcodeDetected": True,
-                "barcodeLegible": bool(decoded_value),
-                "decodedValue": decoded_value,
-                "barcodeSymbology": symbology,
-                "barcodeBox": [x, y, bw, bh],
+                "barcodeLegible": bool(first["decodedValue"]),
+                "decodedValue": first["decodedValue"],
+                "barcodeSymbology": first["barcodeSymbology"],
+                "barcodeBox": first["barcodeBox"],
+                "barcodeBoxOriginal": first["barcodeBoxOriginal"],
+                "barcodes": barcodes,
+                # Template region searched ([x,y,w,h]); None = full frame
+                "searchRegion": region,
+                # Decoder tier that succeeded and every tier attempted
+                "decodeTier": tier,
+                "decodeTiers": tiers,
             },
-            "barcodeOverlayBlob": {"container": "output", "blobName": overlay_blob},
-            "barcodeRoiBlob": {"container": "output", "blobName": roi_blob},
+            "barcodeOverlayBlob": overlay_ref,
+            "barcodeRoiBlob": first["roiBlob"],
         }
-        logger.info("done ok")
+        logger.info("done ok count=%d", len(barcodes))
         return out
 
     except Exception as e:
@@ -0,0 +1,90 @@
+import logging
+import os
+
+import cv2
+import numpy as np
+
+from shared_code import tiled_ops
+from shared_code.image_ops import var_laplacian
+from shared_code.storage_util import download_image
+
+logger = logging.getLogger(__name__)
+
+# Above this Laplacian variance the image is sharp enough: skip enhance_focus
+_SHARP_MIN_LAPVAR = float(os.getenv("QUALITY_SHARP_MIN_LAPVAR", "120"))
+# Above this grayscale std-dev (0-255) the contrast is good: skip CLAHE
+_CONTRAST_MIN_STD = float(os.getenv("QUALITY_CONTRAST_MIN_STD", "50"))
+# Above this fraction of clipped (<=2 or >=253) pixels, always run CLAHE
+_CLIPPING_MAX_FRACTION = float(os.getenv("QUALITY_CLIPPING_MAX_FRACTION", "0.05"))
+
+# Above this fraction of glare pixels, always run CLAHE: a global std-dev that
+# looks fine can hide print washed out around specular highlights, which the
+# local histogram equalization recovers
+_GLARE_MAX_FRACTION = float(os.getenv("QUALITY_GLARE_MAX_FRACTION", "0.01"))
+
+# Glare: near-white, low-saturation pixels (specular highlights)
+_GLARE_MIN_VALUE = 250
+_GLARE_MAX_SATURATION = 30
+
+
+def _metrics(bgr: np.ndarray) -> dict:
+    """Blur, global contrast, exposure clipping and glare, in one pass each."""
+    if tiled_ops.should_tile(bgr):
+        blur = tiled_ops.laplacian_variance(bgr)
+    else:
+        blur = var_laplacian(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY))
+
+    # Histogram-based statistics on a reduced copy (global, scale-invariant)
+    h, w = bgr.shape[:2]
+    step = max(1, max(h, w) // 1024)
+    small = bgr[::step, ::step]
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    total = float(hist.sum())
+    levels = np.arange(256, dtype=np.float64)
+    mean = float((hist * levels).sum() / total)
+    std = float(np.sqrt((hist * (levels - mean) ** 2).sum() / total))
+
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    glare = (hsv[..., 2] >= _GLARE_MIN_VALUE) & (hsv[..., 1] <= _GLARE_MAX_SATURATION)
+
+    return {
+        "blurLaplacianVar": round(float(blur), 3),
+        "contrastStd": round(std, 3),
+        "meanLuminance": round(mean, 3),
+        "underexposedFraction": round(float(hist[:3].sum() / total), 5),
+        "overexposedFraction": round(float(hist[253:].sum() / total), 5),
+        "glareFraction": round(float(glare.mean()), 5),
+    }
+
+
+def _plan(metrics: dict) -> dict:
+    """Which enhancement stages the image actually needs."""
+    clipped = metrics["underexposedFraction"] + metrics["overexposedFraction"]
+    return {
+        "enhanceFocus": metrics["blurLaplacianVar"] < _SHARP_MIN_LAPVAR,
+        "adjustContrast": metrics["contrastStd"] < _CONTRAST_MIN_STD
+        or clipped > _CLIPPING_MAX_FRACTION
+        or metrics["glareFraction"] > _GLARE_MAX_FRACTION,
+    }
+
+
+def main(ref: dict) -> dict:
+    """
+    Cheap image quality assessment used by the orchestrator to skip
+    enhancement stages an image does not need.
+    Input: {"container": "...", "blobName": "..."}
+    Output: {
+        "metrics": {"blurLaplacianVar", "contrastStd", "meanLuminance",
+                    "underexposedFraction", "overexposedFraction", "glareFraction"},
+        "plan": {"enhanceFocus": bool, "adjustContrast": bool}
+    }
+    """
+    bgr = download_image(ref["container"], ref["blobName"])
+    if bgr is None:
+        raise RuntimeError("Could not decode image from input blob")
+
+    metrics = _metrics(bgr)
+    plan = _plan(metrics)
+    logger.info("quality metrics=%s plan=%s", metrics, plan)
+    return {"metrics": metrics, "plan": plan}
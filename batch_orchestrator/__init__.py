@@ -0,0 +1,116 @@
+import azure.durable_functions as df
+
+# Window for inputs started before http_start_batch resolved maxConcurrency
+# (BATCH_MAX_CONCURRENCY default)
+_LEGACY_CONCURRENCY = 8
+
+# Finished items echoed in custom status (keeps it under the 16 KB limit)
+_RECENT_ITEMS = 20
+
+
+def _item_summary(index: int, item: dict, instance_id: str, result) -> dict:
+    """Compact per-image outcome for the aggregate result."""
+    summary = {
+        "index": index,
+        "instanceId": instance_id,
+        "blobName": item.get("blobName"),
+    }
+    if isinstance(result, Exception):
+        summary.update({"ok": False, "error": str(result)})
+        return summary
+
+    validation = (result or {}).get("validation") or {}
+    summary.update(
+        {
+            "ok": True,
+            "validationSummary": validation.get("validationSummary"),
+            "processedImageBlob": (result or {}).get("processedImageBlob"),
+        }
+    )
+    return summary
+
+
+def batch_orchestrator_function(context: df.DurableOrchestrationContext):
+    """
+    Runs one 'orchestrator' sub-orchestration per image with bounded fan-out:
+    {
+        "items": [
+            {"container": "input", "blobName": "uploads/a.png", "expectedData": {...}},
+            ...
+        ],
+        "requestContext": {...},       # shared by every item
+        "maxConcurrency": 4,           # already capped by http_start_batch
+        "settings": {...}              # shared by every item (pipeline_settings)
+    }
+    Output: {"total", "succeeded", "failed", "accepted", "rejected", "items": [...]}
+    """
+    batch = context.get_input()
+    items = batch["items"]
+    request_context = batch.get("requestContext")
+    limit = max(1, int(batch.get("maxConcurrency") or _LEGACY_CONCURRENCY))
+
+    results = [None] * len(items)
+    recent = []
+    in_flight = {}  # task -> (index, sub-instance id)
+    next_index = 0
+    done = 0
+    failed = 0
+
+    def _status(stage: str) -> dict:
+        return {
+            "stage": stage,
+            "total": len(items),
+            "completed": done,
+            "failed": failed,
+            "running": len(in_flight),
+            "recent": recent[-_RECENT_ITEMS:],
+        }
+
+    context.set_custom_status(_status("started"))
+
+    while next_index < len(items) or in_flight:
+        # Fill the window up to the concurrency limit
+        while next_index < len(items) and len(in_flight) < limit:
+            item = items[next_index]
+            sub_id = f"{context.instance_id}:{next_index}"
+            sub_input = {
+                "container": item.get("container"),
+                "blobName": item.get("blobName"),
+                "expectedData": item.get("expectedData"),
+                "requestContext": item.get("requestContext") or request_context,
+                "settings": batch.get("settings"),
+            }
+            task = context.call_sub_orchestrator("orchestrator", sub_input, sub_id)
+            in_flight[task] = (next_index, sub_id)
+            next_index += 1
+
+        winner = yield context.task_any(list(in_flight.keys()))
+        index, sub_id = in_flight.pop(winner)
+        summary = _item_summary(index, items[index], sub_id, winner.result)
+        results[index] = summary
+        done += 1
+        if not summary["ok"]:
+            failed += 1
+        recent.append(
+            {
+                "index": index,
+                "ok": summary["ok"],
+                "validationSummary": summary.get("validationSummary"),
+            }
+        )
+        context.set_custom_status(_status("running"))
+
+    accepted = sum(1 for r in results if r["ok"] and r.get("validationSummary") is True)
+    output = {
+        "total": len(items),
+        "succeeded": len(items) - failed,
+        "failed": failed,
+        "accepted": accepted,
+        "rejected": len(items) - failed - accepted,
+        "items": results,
+    }
+    context.set_custom_status(_status("completed"))
+    return output
+
+
+main = df.Orchestrator.create(batch_orchestrator_function)
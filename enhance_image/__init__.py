@@ -0,0 +1,74 @@
+import numpy as np
+
+from shared_code.image_codec import decode_bgr, decode_gray
+from shared_code.image_ops import (
+    ADJ_CLAHE_CLIP,
+    ADJ_CLAHE_TILE,
+    FOCUS_BLUR_SIGMA,
+    FOCUS_CLAHE_CLIP,
+    FOCUS_CLAHE_TILE,
+    adjust_contrast,
+    enhance_focus,
+    enhance_luminance,
+    to_gray,
+)
+from shared_code.stage_cache import run_cached_stage
+
+# Parameters that change the output; part of the cache key
+_CACHE_PARAMS = {
+    "focus": {
+        "sigma": FOCUS_BLUR_SIGMA,
+        "clip": FOCUS_CLAHE_CLIP,
+        "tile": FOCUS_CLAHE_TILE,
+    },
+    "contrast": {"clip": ADJ_CLAHE_CLIP, "tile": ADJ_CLAHE_TILE},
+}
+
+
+def _enhance_fused(raw: bytes, focus: bool, contrast: bool) -> np.ndarray:
+    bgr = decode_bgr(raw)
+    if bgr is None:
+        raise RuntimeError("Could not decode image from input blob")
+    if focus:
+        bgr = enhance_focus(bgr)
+    if contrast:
+        bgr = adjust_contrast(bgr)
+    return to_gray(bgr)
+
+
+def _enhance_luminance(raw: bytes, focus: bool, contrast: bool) -> np.ndarray:
+    gray = decode_gray(raw)
+    if gray is None:
+        raise RuntimeError("Could not decode image from input blob")
+    return enhance_luminance(gray, focus=focus, contrast=contrast)
+
+
+def main(ref: dict) -> dict:
+    """
+    Fused enhancement: enhance_focus + adjust_contrast_brightness + to_grayscale
+    in memory, with a single download, decode, encode and upload.
+    The result is pixel-identical to running the three activities in sequence.
+    With "mode": "luminance" the image is decoded straight to grayscale and
+    every step runs on that single plane (lower memory/CPU, not bit-exact).
+    "steps" (from assess_quality) can switch off the focus/contrast steps.
+    ref: {
+        "container":"input", "blobName":"uploads/whatever.png",
+        "mode"?: "fused"|"luminance",
+        "steps"?: {"enhanceFocus": bool, "adjustContrast": bool}
+    }
+    output: {"container":"work", "blobName":"bw/<key>.<ext>", "cacheHit": bool}
+    """
+    mode = "luminance" if ref.get("mode") == "luminance" else "fused"
+    steps = ref.get("steps") or {}
+    focus = bool(steps.get("enhanceFocus", True))
+    contrast = bool(steps.get("adjustContrast", True))
+
+    params = {
+        **_CACHE_PARAMS,
+        "mode": mode,
+        "steps": {"focus": focus, "contrast": contrast},
+    }
+    enhance = _enhance_luminance if mode == "luminance" else _enhance_fused
+    return run_cached_stage(
+        ref, "bw", params, lambda raw: enhance(raw, focus, contrast)
+    )
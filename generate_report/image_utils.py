@@ -5,6 +5,7 @@ import os
 import cv2
 import numpy as np
 
+from shared_code.image_codec import decode_image
 from shared_code.storage_util import download_bytes
 
 logger = logging.getLogger(__name__)
@@ -54,8 +55,7 @@ def get_image(
         logger.error("image blob is empty")
         return None
 
-    arr = np.frombuffer(img_bytes, dtype=np.uint8)
-    img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
+    img = decode_image(img_bytes, cv2.IMREAD_COLOR)
 
     if img is None:
         logger.error("image is NOT a valid image (imdecode returned None)")
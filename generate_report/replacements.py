@@ -4,6 +4,8 @@ import os
 import psycopg  # psycopg v3
 from psycopg.rows import dict_row
 
+from shared_code.artifacts import fill_row_artifacts
+
 logger = logging.getLogger(__name__)
 
 POSTGRES_URL = os.environ["POSTGRES_URL"]
@@ -58,7 +60,8 @@ def _fetch_pipeline_row(instance_id: str) -> dict | None:
                     barcode_overlay_blob_name,
                     barcode_roi_container,
                     barcode_roi_blob_name,
-                    barcode_payload
+                    barcode_payload,
+                    ocr_payload
                 FROM vision.vision_pipeline_log
                 WHERE instance_id = %s
                 """,
@@ -258,6 +261,9 @@ def get_report_replacements_and_image_paths(
         )
         return {}, {}
 
+    # Runs persisted with lazy artifacts get their overlays/ROI rendered now
+    fill_row_artifacts(row)
+
     created_date_str, created_time_str = _format_created_strings(row.get("created_at"))
     decoded_value, barcode_symbology = _extract_barcode_fields(
         row.get("barcode_payload") or {}
@@ -0,0 +1,81 @@
+import json
+import logging
+import os
+
+import azure.functions as func
+import psycopg  # psycopg v3
+from psycopg.rows import dict_row
+
+from shared_code.artifacts import ARTIFACT_KINDS, artifact_for_row
+
+logger = logging.getLogger(__name__)
+
+POSTGRES_URL = os.environ["POSTGRES_URL"]
+MIME_JSON = "application/json"
+
+
+def _fetch_row(instance_id: str) -> dict | None:
+    with psycopg.connect(POSTGRES_URL) as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            cur.execute(
+                """
+                SELECT
+                    instance_id,
+                    processed_image_container,
+                    processed_image_blob_name,
+                    ocr_overlay_container,
+                    ocr_overlay_blob_name,
+                    barcode_overlay_container,
+                    barcode_overlay_blob_name,
+                    barcode_roi_container,
+                    barcode_roi_blob_name,
+                    ocr_payload,
+                    barcode_payload
+                FROM vision.vision_pipeline_log
+                WHERE instance_id = %s
+                """,
+                (instance_id,),
+            )
+            return cur.fetchone()
+
+
+def _error(code: str, message: str, status: int) -> func.HttpResponse:
+    return func.HttpResponse(
+        json.dumps({"ok": False, "error": {"code": code, "message": message}}),
+        status_code=status,
+        mimetype=MIME_JSON,
+    )
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    GET /api/artifacts/{instanceId}/{kind}[?index=N]
+    kind: ocr-overlay | barcode-overlay | barcode-roi (index selects the barcode)
+    Returns {"container": "output", "blobName": "..."} of the artifact,
+    rendering and caching it on first request for runs persisted with
+    PIPELINE_LAZY_ARTIFACTS. Read it through get_sas (mode "read").
+    """
+    instance_id = req.route_params.get("instanceId")
+    kind = req.route_params.get("kind")
+    if kind not in ARTIFACT_KINDS:
+        return _error(
+            "invalid_kind", f"kind must be one of {', '.join(ARTIFACT_KINDS)}", 400
+        )
+    try:
+        index = int(req.params.get("index") or 0)
+    except ValueError:
+        return _error("invalid_index", "index must be an integer", 400)
+
+    row = _fetch_row(instance_id)
+    if row is None:
+        return _error("no_data", "No data found for the given instance ID", 404)
+
+    try:
+        ref = artifact_for_row(row, kind, index)
+    except Exception:
+        logger.exception("Failed to render %s for %s", kind, instance_id)
+        return _error("render_failed", "Could not render the artifact", 500)
+
+    if ref is None:
+        return _error("no_artifact", "Nothing to render for this run", 404)
+    return func.HttpResponse(json.dumps(ref), status_code=200, mimetype=MIME_JSON)
@@ -54,20 +54,30 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     except Exception:
         return func.HttpResponse("Invalid JSON body", status_code=400)
 
-    container = data.get("container")  # "input" | "output"
+    container = data.get("container")  # "input" | "output" | "erp" | "work"
     blob_name = data.get("blobName")  # e.g., "uploads/uuid.png"
     mode = (data.get("mode") or "upload").lower()  # "upload" | "read"
     minutes = int(data.get("minutes") or 10)
     content_type = data.get("contentType")  # optional for upload
 
-    # Minimal policy: only upload to input; only read from output or erp.
+    # Minimal policy: only upload to input; only read from output or erp,
+    # plus the claim-check payloads in work/claims/ (orchestration output
+    # ocrResult.claimCheck)
     if mode == "upload" and container != "input":
         return func.HttpResponse(
             "Uploads must target the 'input' container.", status_code=400
         )
-    if mode == "read" and container not in ("output", "erp"):
+    claim_name = str(blob_name or "")
+    is_claim = (
+        container == "work"
+        and claim_name.startswith("claims/")
+        and ".." not in claim_name
+    )
+    if mode == "read" and container not in ("output", "erp") and not is_claim:
         return func.HttpResponse(
-            "Reads are allowed only from 'output' or 'erp' containers.", status_code=400
+            "Reads are allowed only from 'output' or 'erp' containers "
+            "(or 'work' under 'claims/').",
+            status_code=400,
         )
     if not blob_name:
         return func.HttpResponse("Missing 'blobName'.", status_code=400)
@@ -4,6 +4,8 @@ import logging
 import azure.durable_functions as df
 import azure.functions as func
 
+from shared_code import pipeline_settings
+
 logger = logging.getLogger(__name__)
 
 
@@ -110,11 +112,14 @@ async def main(req: func.HttpRequest, starter: str) -> func.HttpResponse:
         return response
 
     # Forward full context to the orchestrator (keeps strict identity requirements)
+    # and the pipeline settings, fixed for the whole run (replays are
+    # deterministic even if an app setting changes meanwhile)
     orch_input = {
         "container": container,
         "blobName": blob_name,
         "expectedData": expected_data,
         "requestContext": request_context,
+        "settings": pipeline_settings.resolve(),
     }
     instance_id = await client.start_new("orchestrator", None, orch_input)
     logger.info("Orchestrator started with instance_id=%s", instance_id)
@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+
+import azure.durable_functions as df
+import azure.functions as func
+
+from shared_code import pipeline_settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on images accepted in one batch request
+_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
+# Upper bound for concurrently running per-image sub-orchestrations; resolved
+# here (not in batch_orchestrator) so replays see the same window
+_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+
+def _bad_request(msg: dict) -> func.HttpResponse:
+    logger.warning("Validation failed: %s", msg)
+    return func.HttpResponse(
+        json.dumps(msg, ensure_ascii=False),
+        status_code=400,
+        mimetype="application/json",
+    )
+
+
+async def main(req: func.HttpRequest, starter: str) -> func.HttpResponse:
+    """
+    Starts a batch_orchestrator run for many images at once:
+    {
+        "items": [
+            {
+                "container": "input",
+                "blobName": "uploads/a.png",
+                "expectedData": {"prodCode": "...", "prodDesc": "...", "lot": "...",
+                                 "expDate": "...", "packDate": "..."}
+            },
+            ...
+        ],
+        "requestContext": {"user": {"id": "auth0|9a0812ffb13", ...}, "client": {...}},
+        "maxConcurrency": 4
+    }
+    Returns the Durable check-status URLs of the batch orchestration.
+    """
+    client = df.DurableOrchestrationClient(starter)
+    try:
+        payload = req.get_json()
+    except Exception as e:
+        logger.exception("Error processing JSON - returning 400")
+        return _bad_request({"error": "Invalid JSON", "detail": str(e)})
+
+    items = payload.get("items")
+    request_context = payload.get("requestContext")
+    max_concurrency = payload.get("maxConcurrency")
+
+    logger.info(
+        "batch items=%s, hasRequestContext=%s, maxConcurrency=%s",
+        len(items) if isinstance(items, list) else None,
+        bool(request_context),
+        max_concurrency,
+    )
+
+    # Basic validations (same rules as http_start, per item)
+    missing = []
+    if not isinstance(items, list) or not items:
+        missing.append("items")
+    elif len(items) > _MAX_ITEMS:
+        missing.append(f"items (max {_MAX_ITEMS})")
+    else:
+        for i, item in enumerate(items):
+            if not isinstance(item, dict):
+                missing.append(f"items[{i}]")
+                continue
+            if item.get("container") != "input":
+                missing.append(f"items[{i}].container=='input'")
+            if not item.get("blobName"):
+                missing.append(f"items[{i}].blobName")
+            expected_data = item.get("expectedData")
+            if not isinstance(expected_data, dict) or not expected_data:
+                missing.append(f"items[{i}].expectedData")
+
+    # Identity must be present because DB enforces NOT NULL
+    user_id = None
+    if isinstance(request_context, dict):
+        user = request_context.get("user") or {}
+        user_id = user.get("id")
+    if not user_id:
+        missing.append("requestContext.user.id")
+
+    if max_concurrency is not None and (
+        not isinstance(max_concurrency, int) or max_concurrency < 1
+    ):
+        missing.append("maxConcurrency>=1")
+
+    if missing:
+        return _bad_request(
+            {
+                "error": "Bad Request",
+                "missing": missing,
+                "hint": "Expected items[{container='input', blobName, expectedData}], requestContext.user.id",
+            }
+        )
+
+    orch_input = {
+        "items": [
+            {
+                "container": item["container"],
+                "blobName": item["blobName"],
+                "expectedData": item["expectedData"],
+            }
+            for item in items
+        ],
+        "requestContext": request_context,
+        "maxConcurrency": min(max_concurrency or _MAX_CONCURRENCY, _MAX_CONCURRENCY),
+        # Shared by every item; fixed for the whole batch
+        "settings": pipeline_settings.resolve(),
+    }
+    instance_id = await client.start_new("batch_orchestrator", None, orch_input)
+    logger.info(
+        "Batch orchestrator started with instance_id=%s items=%d",
+        instance_id,
+        len(items),
+    )
+
+    response = client.create_check_status_response(req, instance_id)
+    logger.info("Response status=%s", response.status_code)
+    return response
@@ -0,0 +1,134 @@
+import io
+import logging
+import os
+import uuid
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from shared_code.storage_util import download_bytes, download_range, upload_image
+
+logger = logging.getLogger(__name__)
+
+# Longest side (px) of the working image; 0 disables normalisation. The
+# orchestrator passes the value of its run as "maxSide"
+INGEST_MAX_SIDE = int(os.getenv("INGEST_MAX_SIDE", "4096"))
+
+# Enough for PNG IHDR and for JPEG SOF after a large EXIF block
+_HEADER_BYTES = 256 * 1024
+
+_REDUCED_FLAGS = {
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+}
+
+
+# EXIF orientations that rotate by 90/270 degrees (OpenCV applies them on decode)
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def _image_size(header: bytes) -> tuple[int, int] | None:
+    """
+    (width, height) as OpenCV will decode it, read from the image header
+    only (no pixel decoding).
+    """
+    try:
+        with Image.open(io.BytesIO(header)) as im:
+            width, height = im.size
+            try:
+                orientation = im.getexif().get(0x0112)
+            except Exception:
+                # e.g. PNG eXIf stored after the (truncated) pixel data
+                orientation = None
+    except Exception:
+        return None
+    if orientation in _TRANSPOSED_ORIENTATIONS:
+        return height, width
+    return width, height
+
+
+def _reduction_factor(longest: int, max_side: int) -> int:
+    """Largest IMREAD_REDUCED_* factor that keeps the image >= max_side."""
+    for factor in (8, 4, 2):
+        if longest // factor >= max_side:
+            return factor
+    return 1
+
+
+def main(ref: dict) -> dict:
+    """
+    Caps the working resolution of the uploaded image.
+    Input: {"container":"input", "blobName":"uploads/<file>", "maxSide": int, ...}
+    Output: {
+        "container": "input"|"work",
+        "blobName": "<unchanged>" | "normalized/<uuid>.<ext>",
+        "scale": float,              # working / original (1.0 = untouched)
+        "originalSize": [w, h] | None,
+        "workingSize": [w, h] | None,
+    }
+    Coordinates found at working resolution map back with geometry.to_original_*.
+    """
+    container, blob_name = ref["container"], ref["blobName"]
+    max_side = int(ref.get("maxSide", INGEST_MAX_SIDE))
+    untouched = {"container": container, "blobName": blob_name, "scale": 1.0}
+
+    header = download_range(container, blob_name, _HEADER_BYTES)
+    size = _image_size(header)
+    if size is None:
+        # Header not readable from the prefix; fall back to a full decode
+        raw = download_bytes(container, blob_name)
+        size = _image_size(raw)
+        if size is None:
+            raise RuntimeError("Could not read image header from input blob")
+    else:
+        raw = None
+
+    width, height = size
+    longest = max(width, height)
+    if max_side <= 0 or longest <= max_side:
+        logger.info("size=%dx%d within limit; not normalised", width, height)
+        return {
+            **untouched,
+            "originalSize": [width, height],
+            "workingSize": [width, height],
+        }
+
+    if raw is None:
+        raw = download_bytes(container, blob_name)
+
+    # 1) Reduced decode (JPEG scales in the DCT domain, much cheaper)
+    factor = _reduction_factor(longest, max_side)
+    flags = _REDUCED_FLAGS.get(factor, cv2.IMREAD_COLOR)
+    img = cv2.imdecode(np.frombuffer(raw, np.uint8), flags)
+    if img is None:
+        raise RuntimeError("Could not decode image from input blob")
+    del raw
+
+    # 2) Exact cap with area interpolation
+    h, w = img.shape[:2]
+    if max(w, h) > max_side:
+        ratio = max_side / max(w, h)
+        new_size = (max(1, round(w * ratio)), max(1, round(h * ratio)))
+        img = cv2.resize(img, new_size, interpolation=cv2.INTER_AREA)
+        h, w = img.shape[:2]
+
+    out_name = upload_image("work", f"normalized/{uuid.uuid4()}", img)
+    scale = w / width
+    logger.info(
+        "normalised %dx%d -> %dx%d (reduced=%d, scale=%.4f)",
+        width,
+        height,
+        w,
+        h,
+        factor,
+        scale,
+    )
+    return {
+        "container": "work",
+        "blobName": out_name,
+        "scale": scale,
+        "originalSize": [width, height],
+        "workingSize": [w, h],
+    }
@@ -1,5 +1,18 @@
 import azure.durable_functions as df
 
+from shared_code import pipeline_settings
+
+
+def _cache_stats(stage_refs: list[dict]) -> dict:
+    """Hit rate of the content-addressed cache over the enhancement stages."""
+    hits = sum(1 for r in stage_refs if r.get("cacheHit"))
+    lookups = len(stage_refs)
+    return {
+        "hits": hits,
+        "lookups": lookups,
+        "hitRate": round(hits / lookups, 3) if lookups else 0.0,
+    }
+
 
 def orchestrator_function(context: df.DurableOrchestrationContext):
     """
@@ -26,38 +39,211 @@ def orchestrator_function(context: df.DurableOrchestrationContext):
                 "ip": "127.0.0.1",
                 "userAgent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
             }
+        },
+        "settings": {                  # added by http_start / http_start_batch
+            "enhanceMode": "chained",
+            "ingestMaxSide": 4096,
+            "adaptiveRouting": false,
+            "roiTemplates": false,
+            "ocrMode": "always"
         }
     }
     """
 
     ref_in = context.get_input()
 
-    ref_focus = yield context.call_activity("enhance_focus", ref_in)
-    context.set_custom_status({"stage": "enhance_focus_done"})
-    ref_cb = yield context.call_activity("adjust_contrast_brightness", ref_focus)
-    context.set_custom_status({"stage": "adjust_contrast_brightness_done"})
-    ref_bw = yield context.call_activity("to_grayscale", ref_cb)
-    context.set_custom_status({"stage": "to_grayscale_done"})
-    bc_out = yield context.call_activity("analyze_barcode", ref_bw)
-    context.set_custom_status({"stage": "analyze_barcode_done"})
-    ocr_out = yield context.call_activity("run_ocr", ref_bw)
-    context.set_custom_status({"stage": "run_ocr_done"})
-
-    payload = {
-        "ocr": ocr_out,
-        "barcode": bc_out,
+    # Settings resolved by the starter (see shared_code/pipeline_settings);
+    # inputs of instances started before they were carried lack them
+    settings = ref_in.get("settings") or pipeline_settings.resolve()
+    enhance_mode = settings["enhanceMode"]
+    ocr_mode = settings["ocrMode"]
+
+    # Per-product lookups only need the request. A task is scheduled only
+    # when it is yielded, so they are yielded in one task_all with the first
+    # image activity (_with_lookups) and run while the image is processed.
+    # Regions are relative boxes (each activity falls back to the full frame
+    # when nothing is found inside its region)
+    prod_code = (ref_in.get("expectedData") or {}).get("prodCode")
+    lookups = {}
+    if settings["roiTemplates"] and prod_code:
+        lookups["roi"] = context.call_activity(
+            "load_roi_template", {"prodCode": prod_code}
+        )
+    if ocr_mode in ("skip", "defer") and prod_code:
+        lookups["gs1"] = context.call_activity(
+            "lookup_gs1_product", {"prodCode": prod_code}
+        )
+    found = {}
+
+    def _with_lookups(task):
+        # Yields task; the first call also schedules and awaits the lookups
+        if not lookups:
+            return (yield task)
+        results = yield context.task_all([task, *lookups.values()])
+        found.update(zip(lookups, results[1:]))
+        lookups.clear()
+        return results[0]
+
+    # Cap the working resolution; "scale" maps coordinates back to the upload
+    ingest = {
+        "container": ref_in["container"],
+        "blobName": ref_in["blobName"],
+        "scale": 1.0,
+    }
+    if settings["ingestMaxSide"] > 0:
+        ingest = yield from _with_lookups(
+            context.call_activity(
+                "normalize_input", {**ref_in, "maxSide": settings["ingestMaxSide"]}
+            )
+        )
+        context.set_custom_status({"stage": "normalize_input_done"})
+
+    quality = None
+    plan = {"enhanceFocus": True, "adjustContrast": True}
+    if settings["adaptiveRouting"]:
+        quality = yield from _with_lookups(
+            context.call_activity("assess_quality", ingest)
+        )
+        plan = quality["plan"]
+        context.set_custom_status({"stage": "assess_quality_done", "plan": plan})
+
+    if enhance_mode in ("fused", "luminance"):
+        enhance_ref = {
+            "container": ingest["container"],
+            "blobName": ingest["blobName"],
+            "mode": enhance_mode,
+            "steps": plan,
+        }
+        ref_bw = yield from _with_lookups(
+            context.call_activity("enhance_image", enhance_ref)
+        )
+        enhance_cache = _cache_stats([ref_bw])
+        context.set_custom_status(
+            {"stage": "enhance_image_done", "enhanceCache": enhance_cache}
+        )
+    else:
+        stage_refs = []
+        ref_cur = ingest
+        if plan["enhanceFocus"]:
+            ref_cur = yield from _with_lookups(
+                context.call_activity("enhance_focus", ref_cur)
+            )
+            stage_refs.append(ref_cur)
+            context.set_custom_status({"stage": "enhance_focus_done"})
+        if plan["adjustContrast"]:
+            ref_cur = yield from _with_lookups(
+                context.call_activity("adjust_contrast_brightness", ref_cur)
+            )
+            stage_refs.append(ref_cur)
+            context.set_custom_status({"stage": "adjust_contrast_brightness_done"})
+        ref_bw = yield from _with_lookups(
+            context.call_activity("to_grayscale", ref_cur)
+        )
+        stage_refs.append(ref_bw)
+        enhance_cache = _cache_stats(stage_refs)
+        context.set_custom_status(
+            {"stage": "to_grayscale_done", "enhanceCache": enhance_cache}
+        )
+
+    # Barcode/OCR work at the working resolution and report the scale
+    work_ref = {**ref_bw, "scale": ingest["scale"]}
+
+    template = (found.get("roi") or {}).get("template")
+    barcode_first = bool((found.get("gs1") or {}).get("gs1"))
+
+    barcode_ref = {
+        **work_ref,
+        "roi": (template or {}).get("barcode"),
+        "roiCodes": (template or {}).get("barcodeCount"),
+        "prodCode": prod_code,
+    }
+    # The crop must hold every expected field, else OCR reads the full frame
+    ocr_ref = {
+        **work_ref,
+        "roi": (template or {}).get("text"),
         "expectedData": ref_in["expectedData"],
     }
+    ocr_skipped = False
+    ocr_task = None
+    if barcode_first:
+        barcode_task = context.call_activity("analyze_barcode", barcode_ref)
+        if ocr_mode == "defer":
+            # "defer" runs OCR anyway: task_any schedules both activities, and
+            # OCR keeps running while the barcode result is validated (and
+            # persisted, if it settles every field)
+            ocr_task = context.call_activity("run_ocr", ocr_ref)
+            yield context.task_any([barcode_task, ocr_task])
+        bc_out = yield barcode_task
+        context.set_custom_status({"stage": "analyze_barcode_done"})
+        val_out = yield context.call_activity(
+            "validate_extracted_data",
+            {"ocr": None, "barcode": bc_out, "expectedData": ref_in["expectedData"]},
+        )
+        ocr_skipped = bool(val_out.get("barcodeSettled"))
+        context.set_custom_status(
+            {
+                "stage": "validation_done" if ocr_skipped else "run_ocr",
+                "ocrSkipped": ocr_skipped,
+                "validation": val_out if ocr_skipped else None,
+            }
+        )
+        ocr_out = {}
+        if not ocr_skipped:
+            ocr_out = yield ocr_task or context.call_activity("run_ocr", ocr_ref)
+        elif ocr_mode == "skip":
+            # run_ocr makes the processed image; without OCR the work image
+            # (throwaway, maybe .npy) is copied to output/. In "defer" mode
+            # the deferred run_ocr adds it to the record.
+            processed = yield context.call_activity("publish_processed_image", ref_bw)
+            ocr_out = {"outputBlob": processed}
+    else:
+        # Both only depend on the grayscale image: fan out and wait for both
+        context.set_custom_status(
+            {
+                "stage": "analyze_barcode_and_run_ocr",
+                "pending": ["analyze_barcode", "run_ocr"],
+            }
+        )
+        bc_out, ocr_out = yield context.task_all(
+            [
+                context.call_activity("analyze_barcode", barcode_ref),
+                context.call_activity("run_ocr", ocr_ref),
+            ]
+        )
+        context.set_custom_status(
+            {
+                "stage": "analyze_barcode_and_run_ocr_done",
+                "done": ["analyze_barcode", "run_ocr"],
+            }
+        )
 
-    val_out = yield context.call_activity("validate_extracted_data", payload)
-    context.set_custom_status({"stage": "validation_done"})
+    if not ocr_skipped:
+        payload = {
+            "ocr": ocr_out,
+            "barcode": bc_out,
+            "expectedData": ref_in["expectedData"],
+        }
+
+        val_out = yield context.call_activity("validate_extracted_data", payload)
+        context.set_custom_status({"stage": "validation_done"})
 
     output = {
+        # Full OCR JSON, or a claim-check reference + summary when it is large
         "ocrResult": ocr_out.get("ocrResult"),
         "processedImageBlob": ocr_out.get("outputBlob"),
         "ocrOverlayBlob": ocr_out.get("overlayBlob"),
+        "ocrMetrics": ocr_out.get("ocrMetrics"),
         "barcode": bc_out,
         "validation": val_out,
+        "enhanceCache": enhance_cache,
+        "quality": quality,
+        "roiTemplate": template,
+        "ocrSkipped": ocr_skipped,
+        "ingest": {
+            "scale": ingest["scale"],
+            "originalSize": ingest.get("originalSize"),
+            "workingSize": ingest.get("workingSize"),
+        },
     }
 
     run_doc = {
@@ -74,6 +260,23 @@ def orchestrator_function(context: df.DurableOrchestrationContext):
     # Will rely on default retry behavior of the activity
     context.set_custom_status({"stage": "persisting_run"})
     yield context.call_activity("persist_run", run_doc)
+
+    if ocr_skipped and ocr_task is not None:
+        # The result is already persisted; OCR (started with the barcode)
+        # now only completes the record (persist_run is an upsert on
+        # instanceId)
+        context.set_custom_status({"stage": "deferred_run_ocr", "validation": val_out})
+        ocr_out = yield ocr_task
+        output.update(
+            {
+                "ocrResult": ocr_out.get("ocrResult"),
+                "processedImageBlob": ocr_out.get("outputBlob"),
+                "ocrOverlayBlob": ocr_out.get("overlayBlob"),
+                "ocrMetrics": ocr_out.get("ocrMetrics"),
+            }
+        )
+        yield context.call_activity("persist_run", run_doc)
+
     context.set_custom_status({"stage": "completed"})
 
     return run_doc["output"]
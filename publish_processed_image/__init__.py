@@ -0,0 +1,20 @@
+import logging
+import uuid
+
+from shared_code.image_codec import extension_for
+from shared_code.storage_util import copy_image_async
+
+logger = logging.getLogger(__name__)
+
+
+async def main(ref: dict) -> dict:
+    """
+    Stores the working image as the processed image of a run when OCR is
+    skipped (run_ocr makes this copy otherwise): work blobs are throwaway and
+    may be .npy, so reports and get_artifact need a copy in output/.
+    Input: {"container", "blobName"}; output: {"container", "blobName"}.
+    """
+    out_name = f"final/ocr/processed/{uuid.uuid4()}{extension_for('output')}"
+    await copy_image_async(ref["container"], ref["blobName"], "output", out_name)
+    logger.info("Processed image stored: %s", out_name)
+    return {"container": "output", "blobName": out_name}
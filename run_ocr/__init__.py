@@ -1,159 +1,157 @@
+import asyncio
 import logging
-import os
 import uuid
 
 import cv2
-import numpy as np
-import requests
 
-from shared_code.storage_util import download_bytes, upload_bytes
+from shared_code.artifacts import LAZY_ARTIFACTS, render_ocr_overlay
+from shared_code.claim_check import offload
+from shared_code.geometry import add_original_polygons, rescale_ocr_result
+from shared_code.image_codec import decode_image, extension_for, is_npy
+from shared_code.ocr_cache import get_cached, ocr_cache_key, put_cached
+from shared_code.ocr_client import analyze_async
+from shared_code.ocr_prep import prepare_ocr_image
+from shared_code.roi_templates import missing_fields, pixel_region
+from shared_code.storage_util import (
+    copy_image_async,
+    delete_blob,
+    download_bytes_async,
+    upload_image_async,
+)
 
 logger = logging.getLogger(__name__)
 
-AZURE_OCR_ENDPOINT = os.environ["AZURE_OCR_ENDPOINT"].rstrip("/")
-AZURE_OCR_KEY = os.environ["AZURE_OCR_KEY"]
-
-
-def _bbox_from_polygon(poly):
-    """Convert a bounding polygon to an axis-aligned bounding box (x1, y1, x2, y2)."""
-    xs, ys = [], []
-    for p in poly:
-        try:
-            xs.append(int(round(p.get("x"))))
-            ys.append(int(round(p.get("y"))))
-        except Exception:
-            pass
-    if not xs or not ys:
-        return None
-    x1, x2 = min(xs), max(xs)
-    y1, y2 = min(ys), max(ys)
-    return (x1, y1, x2, y2)
-
-
-def _clamp_bbox(bbox, img_width, img_height):
-    """Clamp bounding box coordinates to image bounds."""
-    x1, y1, x2, y2 = bbox
-    x1 = max(0, min(x1, img_width - 1))
-    y1 = max(0, min(y1, img_height - 1))
-    x2 = max(0, min(x2, img_width - 1))
-    y2 = max(0, min(y2, img_height - 1))
-    return (x1, y1, x2, y2)
-
-
-def _is_valid_line(ln):
-    """Check if a line dict has a valid bounding polygon."""
-    if not isinstance(ln, dict):
-        return False
-    poly = ln.get("boundingPolygon")
-    return isinstance(poly, list) and len(poly) >= 4
-
-
-def _extract_ocr_lines(ocr_data):
-    """Extract lines from OCR result data."""
-    if not isinstance(ocr_data, dict):
-        return []
-
-    read_result = ocr_data.get("readResult", {})
-    if not isinstance(read_result, dict):
-        return []
-
-    blocks = read_result.get("blocks", [])
-    if not isinstance(blocks, list):
-        return []
-
-    lines = []
-    for blk in blocks:
-        if not isinstance(blk, dict):
-            continue
-        for ln in blk.get("lines", []):
-            if _is_valid_line(ln):
-                lines.append(ln.get("boundingPolygon"))
-
-    return lines
-
-
-def _draw_ocr_overlay(img_bytes, ocr_data):
-    """Create an overlay image with blue rectangles around OCR lines. Returns (overlay_bytes, drawn_count) or (None, 0)."""
-    try:
-        # Decode image
-        arr = np.frombuffer(img_bytes, dtype=np.uint8)
-        img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-        if img is None:
-            raise RuntimeError("OpenCV imdecode returned None")
-
-        overlay = img.copy()
-        h, w = overlay.shape[:2]
-
-        # Extract and draw lines
-        lines = _extract_ocr_lines(ocr_data)
-        drawn = 0
-
-        for poly in lines:
-            bbox = _bbox_from_polygon(poly)
-            if bbox:
-                x1, y1, x2, y2 = _clamp_bbox(bbox, w, h)
-                cv2.rectangle(
-                    overlay, (x1, y1), (x2, y2), (255, 0, 0), thickness=2
-                )  # Blue in BGR
-                drawn += 1
-
-        if drawn == 0:
-            return None, 0
-
-        # Encode overlay
-        ok, buf = cv2.imencode(".png", overlay)
-        if not ok:
-            raise RuntimeError("Failed to encode overlay PNG")
-
-        return buf.tobytes(), drawn
-
-    except Exception as e:
-        logger.exception("Failed to build OCR overlay: %s", e)
-        return None, 0
-
-
-def main(ref: dict) -> dict:
-    raw = download_bytes(ref["container"], ref["blobName"])
-
-    # Final copy to output/final/ocr/processed/<uuid>.png
-    out_name = f"final/ocr/processed/{uuid.uuid4()}.png"
-    upload_bytes("output", out_name, raw, "image/png")
-
-    # OCR
-    url = f"{AZURE_OCR_ENDPOINT}/computervision/imageanalysis:analyze?api-version=2023-10-01&features=read"
-    resp = requests.post(
-        url,
-        headers={
-            "Ocp-Apim-Subscription-Key": AZURE_OCR_KEY,
-            "Content-Type": "application/octet-stream",
-        },
-        data=raw,
-        timeout=30,
+
+def _ocr_summary(ocr_data) -> dict:
+    """Small summary kept in the orchestration history when OCR is offloaded."""
+    read_result = (ocr_data or {}).get("readResult") or {}
+    blocks = read_result.get("blocks") or []
+    metadata = (ocr_data or {}).get("metadata") or {}
+    return {
+        "modelVersion": (ocr_data or {}).get("modelVersion"),
+        "width": metadata.get("width"),
+        "height": metadata.get("height"),
+        "lineCount": sum(len(b.get("lines") or []) for b in blocks),
+        "error": (ocr_data or {}).get("error"),
+    }
+
+
+async def _ocr(img, raw: bytes, region: list | None) -> tuple[dict, dict]:
+    """
+    OCR of the working image, or of region [x, y, w, h] of it. Returns
+    (ocr_json, metrics) with polygons mapped back to the full working image.
+    """
+    h, w = img.shape[:2]
+    offset = (0, 0)
+    if region is not None:
+        x, y, rw, rh = region
+        img, raw, offset = img[y : y + rh, x : x + rw], None, (x, y)
+
+    # Compressed (optionally downscaled) upload; polygons are mapped back below
+    ocr_bytes, ocr_scale = await asyncio.to_thread(
+        prepare_ocr_image, img, None if raw is None or is_npy(raw) else raw
     )
 
-    try:
-        data = resp.json()
-    except Exception:
-        data = {"error": {"code": str(resp.status_code), "message": resp.text}}
-
-    # Build overlay with OCR line rectangles
-    overlay_blob = None
-    overlay_bytes, drawn_count = _draw_ocr_overlay(raw, data)
-
-    if overlay_bytes and drawn_count > 0:
-        overlay_name = f"final/ocr/overlay/{uuid.uuid4()}.png"
-        upload_bytes("output", overlay_name, overlay_bytes, "image/png")
-        overlay_blob = {"container": "output", "blobName": overlay_name}
-        logger.info(
-            "Uploaded OCR overlay with %d rectangles: %s",
-            drawn_count,
-            overlay_name,
-        )
+    # OCR, unless the same bytes were already analyzed (see ocr_cache).
+    # The cache stores the raw response, at the resolution that was sent.
+    cache_key = ocr_cache_key(ocr_bytes)
+    data = await asyncio.to_thread(get_cached, cache_key)
+    if data is not None:
+        logger.info("OCR cache hit: %s", cache_key)
+        metrics = {"attempts": 0, "latencyMs": 0, "cacheHit": True}
     else:
-        logger.info("No OCR lines to draw; overlay not created")
+        # Pooled aiohttp session, retries throttling; see ocr_client
+        data, metrics = await analyze_async(ocr_bytes)
+        metrics["cacheHit"] = False
+        await asyncio.to_thread(put_cached, cache_key, data)
+
+    rescale_ocr_result(data, ocr_scale, offset, (w, h) if region else None)
+    metrics.update({"uploadBytes": len(ocr_bytes), "uploadScale": ocr_scale})
+    return data, metrics
+
+
+async def main(ref: dict) -> dict:
+    # I/O overlaps on the event loop: the final copy (server-side, or a
+    # re-encode of the bytes downloaded here when the work codec differs
+    # from the output one) runs for the whole activity while we download,
+    # call OCR and upload the overlay
+    raw_task = asyncio.create_task(
+        download_bytes_async(ref["container"], ref["blobName"])
+    )
+    out_name = f"final/ocr/processed/{uuid.uuid4()}{extension_for('output')}"
+    copy_task = asyncio.create_task(
+        copy_image_async(
+            ref["container"], ref["blobName"], "output", out_name, raw_task
+        )
+    )
+
+    try:
+        raw = await raw_task
+        img = await asyncio.to_thread(decode_image, raw, cv2.IMREAD_UNCHANGED)
+        if img is None:
+            raise RuntimeError("Could not decode image from input blob")
+
+        # Learned per-product text region (load_roi_template); full frame when
+        # the crop misses an expected field
+        h, w = img.shape[:2]
+        region = pixel_region(ref.get("roi"), w, h)
+        data, ocr_metrics = await _ocr(img, raw, region)
+        missing = missing_fields(data, ref.get("expectedData")) if region else []
+        if missing:
+            logger.info(
+                "Template region %s misses %s; using full frame", region, missing
+            )
+            region = None
+            data, ocr_metrics = await _ocr(img, raw, region)
+        ocr_metrics["region"] = region  # None = full frame
+        # Persisted with the payload: only full-frame runs teach templates
+        data["searchRegion"] = region
+
+        # Polygons stay at working resolution (overlay, validation); the
+        # uploaded-image coordinates go next to them, as barcodeBoxOriginal does
+        add_original_polygons(data, ref.get("scale", 1.0))
+
+        # Build overlay with OCR line rectangles, unless it is rendered on demand
+        # (PIPELINE_LAZY_ARTIFACTS; see shared_code/artifacts)
+        overlay_blob = None
+        overlay, drawn_count = None, 0
+        if not LAZY_ARTIFACTS:
+            overlay, drawn_count = await asyncio.to_thread(
+                render_ocr_overlay, img, data
+            )
+        del img
+
+        if overlay is not None and drawn_count > 0:
+            overlay_name = await upload_image_async(
+                "output", f"final/ocr/overlay/{uuid.uuid4()}", overlay
+            )
+            overlay_blob = {"container": "output", "blobName": overlay_name}
+            logger.info(
+                "Uploaded OCR overlay with %d rectangles: %s",
+                drawn_count,
+                overlay_name,
+            )
+        elif not LAZY_ARTIFACTS:
+            logger.info("No OCR lines to draw; overlay not created")
+
+        # Large OCR responses travel as a claim-check reference (see claim_check)
+        ocr_result = await asyncio.to_thread(offload, data, "ocr", _ocr_summary(data))
+        await copy_task
+    except BaseException:
+        # Decoding or OCR failed: stop the copy instead of leaving it running
+        # unobserved, and drop its blob (the activity retry makes a new one)
+        raw_task.cancel()
+        copy_task.cancel()
+        await asyncio.gather(raw_task, copy_task, return_exceptions=True)
+        await asyncio.to_thread(delete_blob, "output", out_name)
+        raise
 
     return {
-        "ocrResult": data,
+        "ocrResult": ocr_result,
         "outputBlob": {"container": "output", "blobName": out_name},
         "overlayBlob": overlay_blob,
+        "ocrMetrics": ocr_metrics,
+        # Working/original resolution; lines and words also carry
+        # boundingPolygonOriginal
+        "imageScale": ref.get("scale", 1.0),
     }
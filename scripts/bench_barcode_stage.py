@@ -0,0 +1,106 @@
+"""
+Benchmark of the analyze_barcode image handling: legacy colour round trip
+(IMREAD_COLOR -> cvtColor -> full copy for the overlay -> colour ROI) versus
+the single-channel path (IMREAD_GRAYSCALE -> one GRAY2BGR overlay -> ROI view).
+Reports median latency and peak traced memory (numpy/OpenCV buffers).
+Blob transfers are excluded; ZXing runs the same way in both paths.
+
+Usage (from the repository root):
+    python scripts/bench_barcode_stage.py [image] [--runs N] [--width W]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+import zxingcpp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared_code.image_codec import decode_gray, encode_png  # noqa: E402
+
+
+def _box(results, width, height):
+    if not results:
+        return [0, 0, width, height]
+    pos = results[0].position
+    xs = [p.x for p in (pos.top_left, pos.top_right, pos.bottom_right, pos.bottom_left)]
+    ys = [p.y for p in (pos.top_left, pos.top_right, pos.bottom_right, pos.bottom_left)]
+    x, y = max(0, min(xs)), max(0, min(ys))
+    return [x, y, max(1, min(width, max(xs)) - x), max(1, min(height, max(ys)) - y)]
+
+
+def legacy(raw: bytes) -> None:
+    img = cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_COLOR)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    results = zxingcpp.read_barcodes(gray)
+    x, y, w, h = _box(results, gray.shape[1], gray.shape[0])
+    overlay = img.copy()
+    cv2.rectangle(overlay, (x, y), (x + w, y + h), (0, 255, 0), thickness=2)
+    roi = img[y : y + h, x : x + w]
+    encode_png(overlay, 3)
+    encode_png(roi, 3)
+
+
+def current(raw: bytes) -> None:
+    gray = decode_gray(raw)
+    results = zxingcpp.read_barcodes(gray)
+    x, y, w, h = _box(results, gray.shape[1], gray.shape[0])
+    overlay = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+    cv2.rectangle(overlay, (x, y), (x + w, y + h), (0, 255, 0), thickness=2)
+    roi = gray[y : y + h, x : x + w]
+    encode_png(overlay, 3)
+    encode_png(roi, 3)
+
+
+def _measure(fn, raw: bytes, runs: int) -> tuple[float, float]:
+    fn(raw)  # warm-up
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn(raw)
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    fn(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times) * 1000, peak / (1024 * 1024)
+
+
+def main() -> None:
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "image", nargs="?", default=os.path.join(here, "samplePicture.png")
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--width",
+        type=int,
+        default=4096,
+        help="resize the image to this width (working resolution), 0 keeps it",
+    )
+    args = parser.parse_args()
+
+    # Same input analyze_barcode receives: the grayscale PNG from to_grayscale
+    src = cv2.imread(args.image, cv2.IMREAD_GRAYSCALE)
+    if src is None:
+        sys.exit(f"Cannot read {args.image}")
+    if args.width > 0 and src.shape[1] != args.width:
+        height = round(src.shape[0] * args.width / src.shape[1])
+        src = cv2.resize(src, (args.width, height), interpolation=cv2.INTER_CUBIC)
+    raw = encode_png(src, 1)
+    print(f"input {src.shape[1]}x{src.shape[0]} ({len(raw) / 1024:.0f} KiB PNG)")
+
+    for name, fn in (("legacy", legacy), ("current", current)):
+        ms, peak = _measure(fn, raw, args.runs)
+        print(f"{name:8s} median {ms:8.1f} ms   peak {peak:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark of expDate/packDate validation over stored OCR payloads: literal
+matching (expected string searched in the OCR lines) versus structured
+month/year matching (shared_code.dates via shared_code.ocr_index).
+Reports how many fields each approach accepts, the fields only the
+structured comparison accepts, and the lookup throughput (runs/s).
+Accepts alone hide false ones, so each expected date is also looked up
+shifted by one month and by one year (decoys that should not be printed
+on the carton): every decoy found is counted as a false accept.
+
+The corpus is read from PostgreSQL (vision.vision_pipeline_log, POSTGRES_URL)
+or from run JSON files (orchestrator status documents like scripts/resp.json).
+
+Usage (from the repository root):
+    python scripts/bench_date_matching.py [--limit N] [--runs N]
+    python scripts/bench_date_matching.py --files scripts/resp.json ...
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared_code import dates, ocr_index  # noqa: E402
+
+_SQL = """
+SELECT expected_exp_date, expected_pack_date, ocr_payload
+FROM vision.vision_pipeline_log
+WHERE ocr_payload IS NOT NULL
+ORDER BY created_at DESC
+LIMIT %(limit)s
+"""
+
+_FIELDS = (("expDate", 0), ("packDate", 1))
+
+
+def _from_postgres(limit: int) -> list[tuple]:
+    import psycopg
+
+    with psycopg.connect(os.environ["POSTGRES_URL"]) as conn:
+        with conn.cursor() as cur:
+            cur.execute(_SQL, {"limit": limit})
+            return cur.fetchall()
+
+
+def _from_files(paths: list[str]) -> list[tuple]:
+    corpus = []
+    for path in paths:
+        with open(path, encoding="utf-8") as fh:
+            doc = json.load(fh)
+        run_input = doc.get("input") or {}
+        if isinstance(run_input, str):
+            # The Durable status API returns the input as a JSON string
+            run_input = json.loads(run_input)
+        expected = run_input.get("expectedData") or {}
+        ocr = (doc.get("output") or {}).get("ocrResult")
+        if ocr:
+            corpus.append((expected.get("expDate"), expected.get("packDate"), ocr))
+    return corpus
+
+
+def literal(index: dict, row: tuple) -> list[bool]:
+    return [
+        bool(row[i]) and ocr_index.find(index, row[i], field) is not None
+        for field, i in _FIELDS
+    ]
+
+
+def structured(index: dict, row: tuple) -> list[bool]:
+    out = []
+    for field, i in _FIELDS:
+        wanted = dates.parse_month_year(row[i])
+        out.append(
+            bool(wanted) and ocr_index.find_date(index, wanted, field) is not None
+        )
+    return out
+
+
+def _decoys(wanted: tuple[int, int]) -> list[tuple[int, int]]:
+    year, month = wanted
+    return [
+        (year + month // 12, month % 12 + 1),
+        (year - (month == 1), (month - 2) % 12 + 1),
+        (year + 1, month),
+    ]
+
+
+def false_accepts(index: dict, row: tuple) -> list[int]:
+    """Decoy dates found per field (other fields' expected dates excluded)."""
+    real = {dates.parse_month_year(row[i]) for _, i in _FIELDS}
+    out = []
+    for field, i in _FIELDS:
+        wanted = dates.parse_month_year(row[i])
+        decoys = [d for d in _decoys(wanted) if d not in real] if wanted else []
+        out.append(
+            sum(ocr_index.find_date(index, d, field) is not None for d in decoys)
+        )
+    return out
+
+
+def _measure(fn, corpus: list[tuple], runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        for row in corpus:
+            fn(ocr_index.build_index(row[2]), row)
+        times.append(time.perf_counter() - t0)
+    return len(corpus) / statistics.median(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", nargs="*", help="run JSON files instead of DB")
+    parser.add_argument("--limit", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = _from_files(args.files) if args.files else _from_postgres(args.limit)
+    if not corpus:
+        sys.exit("No OCR payloads found")
+    print(f"corpus {len(corpus)} runs")
+
+    accepted = {"literal": [0, 0], "structured": [0, 0]}
+    false = [0, 0]
+    only_structured = []
+    for row in corpus:
+        index = ocr_index.build_index(row[2])
+        lit, struct = literal(index, row), structured(index, row)
+        for i, n in enumerate(false_accepts(index, row)):
+            false[i] += n
+            accepted["literal"][i] += lit[i]
+            accepted["structured"][i] += struct[i]
+            if struct[i] and not lit[i]:
+                field = _FIELDS[i][0]
+                wanted = dates.parse_month_year(row[i])
+                printed = ocr_index.find_date(index, wanted, field)["text"]
+                only_structured.append((field, row[i], printed))
+
+    for name, fn in (("literal", literal), ("structured", structured)):
+        exp_ok, pack_ok = accepted[name]
+        rate = _measure(fn, corpus, args.runs)
+        print(
+            f"{name:10s} expDate {exp_ok:5d}  packDate {pack_ok:5d}"
+            f"   {rate:9.0f} runs/s"
+        )
+    print(f"false accepts (decoys) expDate {false[0]:5d}  packDate {false[1]:5d}")
+    print(f"accepted only by structured matching: {len(only_structured)}")
+    for field, value, printed in only_structured[:20]:
+        print(f"  {field:8s} expected {value!r:20s} printed {printed!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -55,6 +55,11 @@ CREATE TABLE IF NOT EXISTS vision.vision_pipeline_log (
   -- === Raw payloads for deep inspection / debugging ===
   ocr_payload     jsonb,
   barcode_payload jsonb,
+  quality_payload jsonb, -- assess_quality metrics + routing plan (adaptive routing only)
+
+  -- === Enhancement cache (stage_cache) ===
+  enhance_cache_hits    integer, -- enhancement stages served from the cache
+  enhance_cache_lookups integer, -- enhancement stages looked up
 
   -- Constraint to ensure finished_at >= created_at
   CONSTRAINT vision_pipeline_log_valid_finish CHECK (
@@ -62,6 +67,12 @@ CREATE TABLE IF NOT EXISTS vision.vision_pipeline_log (
   )
 );
 
+-- Columns added after the first release (for existing deployments)
+ALTER TABLE vision.vision_pipeline_log
+  ADD COLUMN IF NOT EXISTS quality_payload jsonb,
+  ADD COLUMN IF NOT EXISTS enhance_cache_hits integer,
+  ADD COLUMN IF NOT EXISTS enhance_cache_lookups integer;
+
 -- === Indexes ===
 CREATE INDEX IF NOT EXISTS vpl_created_idx
   ON vision.vision_pipeline_log (created_at);
@@ -141,3 +152,9 @@ COMMENT ON COLUMN vision.vision_pipeline_log.ocr_payload IS
 
 COMMENT ON COLUMN vision.vision_pipeline_log.barcode_payload IS
 'Full barcode detection and decoding result (JSONB).';
+
+COMMENT ON COLUMN vision.vision_pipeline_log.quality_payload IS
+'Image quality metrics (blur, contrast, exposure clipping, glare) and the enhancement plan chosen by adaptive routing (JSONB).';
+
+COMMENT ON COLUMN vision.vision_pipeline_log.enhance_cache_hits IS
+'Enhancement stages of the run served from the content-addressed cache; hit rate across runs = sum(enhance_cache_hits) / sum(enhance_cache_lookups).';
@@ -0,0 +1,244 @@
+import logging
+import os
+
+import cv2
+import numpy as np
+
+from shared_code.image_codec import decode_image, extension_for
+from shared_code.storage_util import download_bytes, get_properties, upload_image
+
+logger = logging.getLogger(__name__)
+
+# Rendering of the visual artifacts (OCR overlay, barcode overlay and ROIs).
+# Activities render them eagerly unless PIPELINE_LAZY_ARTIFACTS is true; then
+# only geometry (OCR polygons, barcode boxes) and the processed image are
+# persisted, and ensure_artifact() renders on first request and caches the
+# result under output/final/lazy/<instanceId>/.
+LAZY_ARTIFACTS = os.getenv("PIPELINE_LAZY_ARTIFACTS", "false").strip().lower() == "true"
+
+ARTIFACT_KINDS = ("ocr-overlay", "barcode-overlay", "barcode-roi")
+
+
+def _bbox_from_polygon(poly):
+    """Convert a bounding polygon to an axis-aligned bounding box (x1, y1, x2, y2)."""
+    xs, ys = [], []
+    for p in poly:
+        try:
+            xs.append(int(round(p.get("x"))))
+            ys.append(int(round(p.get("y"))))
+        except Exception:
+            pass
+    if not xs or not ys:
+        return None
+    x1, x2 = min(xs), max(xs)
+    y1, y2 = min(ys), max(ys)
+    return (x1, y1, x2, y2)
+
+
+def _clamp_bbox(bbox, img_width, img_height):
+    """Clamp bounding box coordinates to image bounds."""
+    x1, y1, x2, y2 = bbox
+    x1 = max(0, min(x1, img_width - 1))
+    y1 = max(0, min(y1, img_height - 1))
+    x2 = max(0, min(x2, img_width - 1))
+    y2 = max(0, min(y2, img_height - 1))
+    return (x1, y1, x2, y2)
+
+
+def _is_valid_line(ln):
+    """Check if a line dict has a valid bounding polygon."""
+    if not isinstance(ln, dict):
+        return False
+    poly = ln.get("boundingPolygon")
+    return isinstance(poly, list) and len(poly) >= 4
+
+
+def ocr_line_polygons(ocr_data) -> list:
+    """boundingPolygon of every OCR line with at least 4 points."""
+    if not isinstance(ocr_data, dict):
+        return []
+
+    read_result = ocr_data.get("readResult", {})
+    if not isinstance(read_result, dict):
+        return []
+
+    blocks = read_result.get("blocks", [])
+    if not isinstance(blocks, list):
+        return []
+
+    lines = []
+    for blk in blocks:
+        if not isinstance(blk, dict):
+            continue
+        for ln in blk.get("lines", []):
+            if _is_valid_line(ln):
+                lines.append(ln.get("boundingPolygon"))
+
+    return lines
+
+
+def render_ocr_overlay(img, ocr_data):
+    """Create an overlay image with blue rectangles around OCR lines. Returns (overlay, drawn_count) or (None, 0)."""
+    try:
+        if img is None:
+            raise RuntimeError("Source image could not be decoded")
+
+        # Gray input: the colour conversion is already the copy we draw on
+        overlay = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if img.ndim == 2 else img.copy()
+        h, w = overlay.shape[:2]
+
+        # Extract and draw lines
+        lines = ocr_line_polygons(ocr_data)
+        drawn = 0
+
+        for poly in lines:
+            bbox = _bbox_from_polygon(poly)
+            if bbox:
+                x1, y1, x2, y2 = _clamp_bbox(bbox, w, h)
+                cv2.rectangle(
+                    overlay, (x1, y1), (x2, y2), (255, 0, 0), thickness=2
+                )  # Blue in BGR
+                drawn += 1
+
+        if drawn == 0:
+            return None, 0
+
+        return overlay, drawn
+
+    except Exception as e:
+        logger.exception("Failed to build OCR overlay: %s", e)
+        return None, 0
+
+
+def render_barcode_overlay(gray: np.ndarray, boxes: list[list]) -> np.ndarray:
+    """
+    Colour overlay with a green rectangle per barcode box [x, y, w, h].
+    The GRAY2BGR conversion is the only full-size allocation.
+    """
+    overlay = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR) if gray.ndim == 2 else gray.copy()
+    for x, y, bw, bh in boxes:
+        cv2.rectangle(overlay, (x, y), (x + bw, y + bh), (0, 255, 0), thickness=2)
+    return overlay
+
+
+def crop(img: np.ndarray, box: list) -> np.ndarray:
+    """View of img inside box [x, y, w, h] (no copy)."""
+    x, y, bw, bh = box
+    return img[y : y + bh, x : x + bw]
+
+
+def _barcode_boxes(barcode_data: dict) -> list[list]:
+    entries = barcode_data.get("barcodes") or [barcode_data]
+    return [e["barcodeBox"] for e in entries if e.get("barcodeBox")]
+
+
+def ensure_artifact(
+    instance_id: str,
+    kind: str,
+    source: dict,
+    ocr_result: dict | None = None,
+    barcode_data: dict | None = None,
+    index: int = 0,
+) -> dict | None:
+    """
+    Returns {"container": "output", "blobName": ...} for an artifact of a run,
+    rendering it from `source` (processed image reference) and the persisted
+    geometry the first time. Later calls only check that the blob exists.
+    kind: "ocr-overlay" | "barcode-overlay" | "barcode-roi" (index = barcode).
+    Returns None when there is nothing to draw.
+    """
+    if kind not in ARTIFACT_KINDS:
+        raise ValueError(f"Unknown artifact kind: {kind}")
+
+    suffix = f"-{index}" if kind == "barcode-roi" else ""
+    stem = f"final/lazy/{instance_id}/{kind}{suffix}"
+    cached = f"{stem}{extension_for('output')}"
+    if get_properties("output", cached) is not None:
+        return {"container": "output", "blobName": cached}
+
+    boxes = _barcode_boxes(barcode_data or {})
+    # Nothing to draw: no OCR lines / no barcode (at that index)
+    if kind == "ocr-overlay" and not ocr_line_polygons(ocr_result):
+        return None
+    if kind == "barcode-overlay" and not boxes:
+        return None
+    if kind == "barcode-roi" and not 0 <= index < len(boxes):
+        return None
+
+    img = decode_image(
+        download_bytes(source["container"], source["blobName"]), cv2.IMREAD_UNCHANGED
+    )
+    if img is None:
+        raise RuntimeError("Could not decode the processed image")
+
+    if kind == "ocr-overlay":
+        rendered, _ = render_ocr_overlay(img, ocr_result)
+    elif kind == "barcode-overlay":
+        rendered = render_barcode_overlay(img, boxes)
+    else:
+        rendered = crop(img, boxes[index])
+    if rendered is None:
+        return None
+
+    blob_name = upload_image("output", stem, rendered)
+    logger.info("rendered artifact %s for %s: %s", kind, instance_id, blob_name)
+    return {"container": "output", "blobName": blob_name}
+
+
+# vision_pipeline_log columns of each artifact rendered eagerly
+_ROW_COLUMNS = {
+    "ocr-overlay": ("ocr_overlay_container", "ocr_overlay_blob_name"),
+    "barcode-overlay": ("barcode_overlay_container", "barcode_overlay_blob_name"),
+    "barcode-roi": ("barcode_roi_container", "barcode_roi_blob_name"),
+}
+
+
+def artifact_for_row(row: dict, kind: str, index: int = 0) -> dict | None:
+    """
+    Artifact reference for a vision_pipeline_log row: the eagerly uploaded blob
+    if the run has one, otherwise rendered on demand via ensure_artifact().
+    The row needs the processed image, ocr_payload and barcode_payload columns.
+    """
+    container_key, blob_key = _ROW_COLUMNS[kind]
+    if index == 0 and row.get(blob_key):
+        return {"container": row.get(container_key), "blobName": row[blob_key]}
+
+    barcode_roi = kind == "barcode-roi"
+    barcode_data = (row.get("barcode_payload") or {}).get("barcodeData") or {}
+    if barcode_roi:
+        # Multi-barcode runs keep eager ROIs per entry
+        entries = barcode_data.get("barcodes") or []
+        if 0 <= index < len(entries) and entries[index].get("roiBlob"):
+            return entries[index]["roiBlob"]
+
+    if not row.get("processed_image_blob_name"):
+        return None
+    source = {
+        "container": row.get("processed_image_container"),
+        "blobName": row["processed_image_blob_name"],
+    }
+    return ensure_artifact(
+        row["instance_id"],
+        kind,
+        source,
+        ocr_result=row.get("ocr_payload"),
+        barcode_data=barcode_data,
+        index=index,
+    )
+
+
+def fill_row_artifacts(row: dict) -> dict:
+    """Sets the artifact columns of a row that were left empty (lazy runs)."""
+    for kind, (container_key, blob_key) in _ROW_COLUMNS.items():
+        if row.get(blob_key):
+            continue
+        try:
+            ref = artifact_for_row(row, kind)
+        except Exception as exc:
+            logger.error(
+                "could not render %s for %s: %s", kind, row.get("instance_id"), exc
+            )
+            continue
+        if ref:
+            row[container_key], row[blob_key] = ref["container"], ref["blobName"]
+    return row
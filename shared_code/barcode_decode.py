@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import zxingcpp
+
+logger = logging.getLogger(__name__)
+
+# Tiered decoding: cheap pass first, escalate only on failure.
+#   located -> gradient-based localisation, then ZXing on the top-k candidate
+#             crops in parallel (product symbologies)
+#   fast   -> downscaled image, product symbologies only, no rotation
+#   full   -> full resolution, product symbologies, rotation + ZXing downscale
+#   harder -> full resolution, every symbology, rotation, second binarizer
+#             and the inverted image (light bars on dark background)
+BARCODE_FAST_MAX_SIDE = int(os.getenv("BARCODE_FAST_MAX_SIDE", "1280"))
+BARCODE_DEFAULT_FORMATS = os.getenv(
+    "BARCODE_DEFAULT_FORMATS", "EAN13,EAN8,Code128,DataMatrix"
+)
+# JSON object prodCode -> comma-separated formats, e.g. {"EUTEBROL-A7E0": "EAN13"}
+BARCODE_PRODUCT_FORMATS = json.loads(os.getenv("BARCODE_PRODUCT_FORMATS", "{}"))
+
+# Localisation pre-pass (Scharr gradient difference + closing + contours)
+BARCODE_LOCATE = os.getenv("BARCODE_LOCATE", "true").strip().lower() == "true"
+BARCODE_LOCATE_MAX_SIDE = int(os.getenv("BARCODE_LOCATE_MAX_SIDE", "1024"))
+BARCODE_CANDIDATES = int(os.getenv("BARCODE_CANDIDATES", "4"))
+BARCODE_WORKERS = int(os.getenv("BARCODE_WORKERS", str(os.cpu_count() or 2)))
+
+TIERS = ("located", "fast", "full", "harder")
+
+# Empty format set: ZXing reads every symbology (read_barcodes rejects None)
+_ANY_FORMAT = zxingcpp.BarcodeFormat.NONE
+
+# zxing-cpp releases the GIL while decoding, so crops decode in parallel
+_pool = ThreadPoolExecutor(max_workers=max(1, BARCODE_WORKERS))
+
+# Per-worker counters (hit rate and latency per tier), logged after each decode
+_stats = {t: {"attempts": 0, "hits": 0, "totalMs": 0.0} for t in TIERS}
+_stats_lock = threading.Lock()
+
+
+def formats_for(prod_code: str | None) -> zxingcpp.BarcodeFormats | None:
+    """Symbologies expected for a product (None = all formats)."""
+    spec = BARCODE_PRODUCT_FORMATS.get(prod_code or "", BARCODE_DEFAULT_FORMATS)
+    spec = (spec or "").strip()
+    return zxingcpp.barcode_formats_from_str(spec) if spec else None
+
+
+def _downscale(gray: np.ndarray, max_side: int) -> tuple[np.ndarray, float]:
+    h, w = gray.shape[:2]
+    longest = max(h, w)
+    if max_side <= 0 or longest <= max_side:
+        return gray, 1.0
+    factor = max_side / longest
+    size = (max(1, int(round(w * factor))), max(1, int(round(h * factor))))
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA), size[0] / w
+
+
+def locate_candidates(gray: np.ndarray, k: int = BARCODE_CANDIDATES) -> list[list]:
+    """
+    Candidate barcode regions [x, y, w, h] (input coordinates), largest first.
+    Bars give a strong gradient across them and a weak one along them, so
+    |Scharr_x - Scharr_y| highlights 1D codes in either orientation; closing
+    merges the bars into a blob and contours give the boxes.
+    """
+    small, factor = _downscale(gray, BARCODE_LOCATE_MAX_SIDE)
+    grad_x = cv2.Scharr(small, cv2.CV_32F, 1, 0)
+    grad_y = cv2.Scharr(small, cv2.CV_32F, 0, 1)
+    gradient = cv2.convertScaleAbs(cv2.absdiff(np.abs(grad_x), np.abs(grad_y)))
+    gradient = cv2.blur(gradient, (9, 9))
+    _, mask = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+
+    # Kernel ~2% of the image side closes the gaps between bars
+    side = max(5, int(max(small.shape) * 0.02) | 1)
+    mask = cv2.morphologyEx(
+        mask, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (side, side))
+    )
+    mask = cv2.erode(mask, None, iterations=3)
+    mask = cv2.dilate(mask, None, iterations=3)
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    min_area = small.shape[0] * small.shape[1] * 0.001
+    boxes = []
+    for c in contours:
+        x, y, w, h = cv2.boundingRect(c)
+        if w * h < min_area:
+            continue
+        # Barcodes are neither slivers nor the whole frame
+        if max(w, h) > 12 * min(w, h) or w * h > 0.8 * small.size:
+            continue
+        boxes.append((w * h, [x, y, w, h]))
+    boxes.sort(key=lambda b: b[0], reverse=True)
+
+    H, W = gray.shape[:2]
+    out = []
+    for _, (x, y, w, h) in boxes[:k]:
+        # Back to input size with a 10% margin (quiet zone, tight contours)
+        mx, my = int(w * 0.1) + 2, int(h * 0.1) + 2
+        x0 = max(0, int((x - mx) / factor))
+        y0 = max(0, int((y - my) / factor))
+        x1 = min(W, int(round((x + w + mx) / factor)))
+        y1 = min(H, int(round((y + h + my) / factor)))
+        out.append([x0, y0, x1 - x0, y1 - y0])
+    return out
+
+
+def _read_located(gray, formats):
+    if not BARCODE_LOCATE:
+        return []
+    candidates = locate_candidates(gray)
+
+    def _read(box):
+        x, y, w, h = box
+        results = zxingcpp.read_barcodes(gray[y : y + h, x : x + w], formats=formats)
+        return [(r, 1.0, (x, y)) for r in results]
+
+    hits = []
+    for found in _pool.map(_read, candidates):
+        hits.extend(found)
+    return hits
+
+
+def _read_fast(gray, formats):
+    small, factor = _downscale(gray, BARCODE_FAST_MAX_SIDE)
+    results = zxingcpp.read_barcodes(
+        small, formats=formats, try_rotate=False, try_downscale=False
+    )
+    return [(r, factor, (0, 0)) for r in results]
+
+
+def _read_full(gray, formats):
+    return [(r, 1.0, (0, 0)) for r in zxingcpp.read_barcodes(gray, formats=formats)]
+
+
+def _read_harder(gray, formats):
+    for binarizer in (
+        zxingcpp.Binarizer.LocalAverage,
+        zxingcpp.Binarizer.GlobalHistogram,
+    ):
+        for img in (gray, cv2.bitwise_not(gray)):
+            results = zxingcpp.read_barcodes(img, binarizer=binarizer)
+            if results:
+                return [(r, 1.0, (0, 0)) for r in results]
+    return []
+
+
+_READERS = {
+    "located": _read_located,
+    "fast": _read_fast,
+    "full": _read_full,
+    "harder": _read_harder,
+}
+
+
+def decode_tiered(
+    gray: np.ndarray, formats: zxingcpp.BarcodeFormats | None = None
+) -> tuple[list, str | None, list[dict]]:
+    """
+    Runs the tiers in order and stops at the first one that decodes.
+    Returns (hits, tier, log):
+    - hits: [(result, factor, (dx, dy))]; a result position p maps to the
+      input image as p / factor + (dx, dy)
+    - tier: name of the successful tier, or None
+    - log: [{"tier", "hit", "latencyMs"}] for every tier attempted
+    """
+    if formats is None:
+        formats = _ANY_FORMAT
+    log = []
+    for tier in TIERS:
+        if tier == "located" and not BARCODE_LOCATE:
+            continue
+        t0 = time.perf_counter()
+        hits = _READERS[tier](gray, formats)
+        ms = (time.perf_counter() - t0) * 1000
+        log.append({"tier": tier, "hit": bool(hits), "latencyMs": round(ms, 1)})
+        _record(tier, bool(hits), ms)
+        if hits:
+            logger.info("barcode tiers=%s stats=%s", log, tier_stats())
+            return _unique(hits), tier, log
+    logger.info("barcode tiers=%s stats=%s", log, tier_stats())
+    return [], None, log
+
+
+def _unique(hits: list) -> list:
+    """Drops repeated reads of the same code (e.g. overlapping candidate crops)."""
+    seen, out = set(), []
+    for hit in hits:
+        r = hit[0]
+        key = (getattr(r, "format", None), getattr(r, "text", None))
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append(hit)
+    return out
+
+
+def _record(tier: str, hit: bool, ms: float) -> None:
+    with _stats_lock:
+        s = _stats[tier]
+        s["attempts"] += 1
+        s["hits"] += int(hit)
+        s["totalMs"] += ms
+
+
+def tier_stats() -> dict:
+    """Hit rate and mean latency per tier since the worker started."""
+    with _stats_lock:
+        return {
+            tier: {
+                "attempts": s["attempts"],
+                "hitRate": (
+                    round(s["hits"] / s["attempts"], 3) if s["attempts"] else 0.0
+                ),
+                "avgMs": (
+                    round(s["totalMs"] / s["attempts"], 1) if s["attempts"] else 0.0
+                ),
+            }
+            for tier, s in _stats.items()
+        }
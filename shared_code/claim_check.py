@@ -0,0 +1,57 @@
+import json
+import logging
+import os
+import uuid
+
+from shared_code.storage_util import download_bytes, upload_bytes
+
+logger = logging.getLogger(__name__)
+
+# Activity outputs whose JSON is larger than this are stored in a blob and
+# replaced by a small reference, keeping them out of the Durable history.
+# 0 offloads every payload; a negative value disables the claim check.
+CLAIM_CHECK_MIN_BYTES = int(os.getenv("CLAIM_CHECK_MIN_BYTES", "16384"))
+
+CLAIM_CONTAINER = "work"
+_CLAIM_KEY = "claimCheck"
+
+
+def is_claim(value) -> bool:
+    """True if value is a claim-check reference produced by offload()."""
+    return isinstance(value, dict) and isinstance(value.get(_CLAIM_KEY), dict)
+
+
+def offload(payload, kind: str, summary: dict | None = None):
+    """
+    Returns payload unchanged when small, otherwise stores it as JSON in
+    work/claims/<kind>/<uuid>.json and returns:
+    {"claimCheck": {"container", "blobName", "bytes"}, "summary": {...}}
+    """
+    if CLAIM_CHECK_MIN_BYTES < 0 or payload is None:
+        return payload
+
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+    if len(data) < CLAIM_CHECK_MIN_BYTES:
+        return payload
+
+    blob_name = f"claims/{kind}/{uuid.uuid4()}.json"
+    upload_bytes(CLAIM_CONTAINER, blob_name, data, "application/json")
+    logger.info("offloaded %s payload bytes=%d to %s", kind, len(data), blob_name)
+    return {
+        _CLAIM_KEY: {
+            "container": CLAIM_CONTAINER,
+            "blobName": blob_name,
+            "bytes": len(data),
+        },
+        "summary": summary or {},
+    }
+
+
+def resolve(value):
+    """Returns the original payload, downloading it if value is a claim check."""
+    if not is_claim(value):
+        return value
+    ref = value[_CLAIM_KEY]
+    return json.loads(download_bytes(ref["container"], ref["blobName"]))
@@ -0,0 +1,170 @@
+import re
+
+from shared_code.fuzzy_match import fold
+
+# Month/year extraction for printed expiry and packing dates. Cartons print
+# the same date as "V JUL/2027", "JUL 2027", "07/2027", "07-27" or
+# "2027-07"; every form is normalised to (year, month) so an expected date
+# matches any of them. Patterns are compiled once per process. Digits of a
+# 4-digit year may be OCR-confused letters ("2O27"): they are folded with
+# the fuzzy_match table.
+
+MONTHS = {
+    # Spanish
+    "ENE": 1,
+    "ENERO": 1,
+    "FEB": 2,
+    "FEBRERO": 2,
+    "MAR": 3,
+    "MARZO": 3,
+    "ABR": 4,
+    "ABRIL": 4,
+    "MAY": 5,
+    "MAYO": 5,
+    "JUN": 6,
+    "JUNIO": 6,
+    "JUL": 7,
+    "JULIO": 7,
+    "AGO": 8,
+    "AGOSTO": 8,
+    "SEP": 9,
+    "SEPT": 9,
+    "SET": 9,
+    "SEPTIEMBRE": 9,
+    "SETIEMBRE": 9,
+    "OCT": 10,
+    "OCTUBRE": 10,
+    "NOV": 11,
+    "NOVIEMBRE": 11,
+    "DIC": 12,
+    "DICIEMBRE": 12,
+    # English
+    "JAN": 1,
+    "JANUARY": 1,
+    "FEBRUARY": 2,
+    "MARCH": 3,
+    "APR": 4,
+    "APRIL": 4,
+    "JUNE": 6,
+    "JULY": 7,
+    "AUG": 8,
+    "AUGUST": 8,
+    "SEPTEMBER": 9,
+    "OCTOBER": 10,
+    "NOVEMBER": 11,
+    "DEC": 12,
+    "DECEMBER": 12,
+}
+
+# Characters read as digits in 4-digit years ("2O27"): true digits plus
+# letters folding to one. Months, days and 2-digit years need real digits,
+# so words such as "JULIO" or "MARZO" never read as a year.
+_D = (
+    "[0-9"
+    + "".join(sorted(ch for ch in map(chr, range(65, 91)) if fold(ch).isdigit()))
+    + "]"
+)
+_YEAR4 = rf"2{_D}{{3}}"
+_SEP = r"\s*[/.\-]\s*"
+_MONTH_NAMES = "|".join(sorted(MONTHS, key=len, reverse=True))
+
+# Tried in this order; a later pattern never reuses characters of an earlier
+# match, so "31/07/2027" is one date and not also "07/20". The last entry
+# (bare "07-27", "10.50") also reads prices, lots or codes; it is only used
+# when short=True (values known to be dates, or lines carrying the label).
+_PATTERNS = (
+    # 31/07/2027, 31-07-27 (day first)
+    (
+        re.compile(
+            rf"(?<![0-9])(?P<d>\d{{1,2}}){_SEP}(?P<m>\d{{1,2}}){_SEP}"
+            rf"(?P<y>{_YEAR4}|\d{{2}})(?![0-9])"
+        ),
+        "numeric",
+    ),
+    # 2027-07, 2027/07/31
+    (
+        re.compile(
+            rf"(?<![0-9])(?P<y>{_YEAR4}){_SEP}(?P<m>\d{{1,2}})"
+            rf"(?:{_SEP}(?P<d>\d{{1,2}}))?(?![0-9])"
+        ),
+        "numeric",
+    ),
+    # JUL/2027, JUL 27, JULIO DE 2027, 31 JUL 2027 (separator required)
+    (
+        re.compile(
+            rf"(?<![A-Z])(?P<m>{_MONTH_NAMES})\.?(?:\s+DE)?(?:\s*[/.\-]\s*|\s+)"
+            rf"(?P<y>{_YEAR4}|\d{{2}})(?![0-9A-Z])"
+        ),
+        "name",
+    ),
+    # 2027 JUL
+    (
+        re.compile(
+            rf"(?<![0-9])(?P<y>{_YEAR4})[\s/.\-]+(?P<m>{_MONTH_NAMES})(?![A-Z])"
+        ),
+        "name",
+    ),
+    # 07/2027, 7.2027
+    (
+        re.compile(rf"(?<![0-9])(?P<m>\d{{1,2}}){_SEP}(?P<y>{_YEAR4})(?![0-9])"),
+        "numeric",
+    ),
+)
+_SHORT_PATTERN = (
+    # 07-27, 07/27, 10.50
+    re.compile(rf"(?<![0-9])(?P<m>\d{{1,2}}){_SEP}(?P<y>\d{{2}})(?![0-9])"),
+    "numeric",
+)
+
+
+def _year(text: str) -> int:
+    value = int(fold(text))
+    return value + 2000 if value < 100 else value
+
+
+def _month(text: str, kind: str) -> int | None:
+    month = MONTHS.get(text) if kind == "name" else int(fold(text))
+    return month if month and 1 <= month <= 12 else None
+
+
+def extract_dates(text: str, short: bool = False) -> list[dict]:
+    """
+    Every month/year date in an upper-cased text, in reading order:
+    [{'year', 'month', 'start', 'end', 'text'}] (end exclusive).
+    short=True also accepts the bare "MM-YY" form.
+    """
+    found, taken = [], []
+    patterns = _PATTERNS + (_SHORT_PATTERN,) if short else _PATTERNS
+    for pattern, kind in patterns:
+        for m in pattern.finditer(text):
+            start, end = m.span()
+            if any(start < t_end and t_start < end for t_start, t_end in taken):
+                continue
+            month = _month(m.group("m"), kind)
+            if month is None:
+                continue
+            year = _year(m.group("y"))
+            if not 2000 <= year <= 2099:
+                continue
+            taken.append((start, end))
+            found.append(
+                {
+                    "year": year,
+                    "month": month,
+                    "start": start,
+                    "end": end,
+                    "text": m.group(0),
+                }
+            )
+    return sorted(found, key=lambda d: d["start"])
+
+
+def parse_month_year(value: str | None) -> tuple[int, int] | None:
+    """(year, month) of the first date in an expected value like 'V JUL/2027'."""
+    dates = extract_dates((value or "").upper(), short=True)
+    return (dates[0]["year"], dates[0]["month"]) if dates else None
+
+
+def normalise(year: int, month: int) -> str:
+    """'YYYY-MM' form reported next to a date match."""
+    return f"{year:04d}-{month:02d}"
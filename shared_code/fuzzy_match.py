@@ -0,0 +1,145 @@
+import os
+import re
+from functools import lru_cache
+
+# Approximate substring search for validating OCR text. Myers' bit-parallel
+# edit distance (semi-global: the pattern may start anywhere in the text)
+# runs in O(len(text)) big-int operations per pattern. Characters of the
+# same confusion class ("0O", "1I", ...) compare as equal, so common OCR
+# misreads cost nothing; any other substitution, insertion or deletion
+# costs one edit. Zero-edit matches (the default budget) are found first
+# with a precompiled character-class regex, which runs at C speed.
+#
+# OCR_CONFUSION_CLASSES: comma-separated groups of interchangeable characters
+# OCR_MATCH_MAX_EDITS:   hard cap on edits for any field. Defaults to 0:
+#                        lots one digit apart are different lots
+# OCR_MATCH_ERROR_RATE:  edits allowed per character of the expected value
+#                        (short values such as "S 1" get 0 edits)
+CONFUSION_CLASSES = os.getenv("OCR_CONFUSION_CLASSES", "0O,1I,5S,8B,2Z")
+MATCH_MAX_EDITS = int(os.getenv("OCR_MATCH_MAX_EDITS", "0"))
+MATCH_ERROR_RATE = float(os.getenv("OCR_MATCH_ERROR_RATE", "0.15"))
+
+
+def _confusion_table(spec: str) -> dict[str, str]:
+    """'0O,1I' -> {'0': '0O', 'O': '0O', '1': '1I', 'I': '1I'}"""
+    table = {}
+    for group in spec.upper().split(","):
+        members = "".join(dict.fromkeys(group.strip()))
+        for ch in members:
+            table[ch] = "".join(dict.fromkeys(table.get(ch, ch) + members))
+    return table
+
+
+_CONFUSIONS = _confusion_table(CONFUSION_CLASSES)
+# Maps every character to one representative of its confusion class
+_FOLD = str.maketrans({ch: min(aliases) for ch, aliases in _CONFUSIONS.items()})
+
+
+def fold(text: str) -> str:
+    """Folds confusable characters together: fold('S1O1I44') == fold('5101144')."""
+    return text.translate(_FOLD)
+
+
+def max_edits(length: int) -> int:
+    """Edits tolerated for an expected value of `length` characters."""
+    return max(0, min(MATCH_MAX_EDITS, int(length * MATCH_ERROR_RATE)))
+
+
+@lru_cache(maxsize=4096)
+def _pattern_masks(pattern: str) -> dict[str, int]:
+    """Peq bit vectors: bit i is set for every text char matching pattern[i]."""
+    masks = {}
+    for i, ch in enumerate(pattern):
+        for alias in _CONFUSIONS.get(ch, ch):
+            masks[alias] = masks.get(alias, 0) | (1 << i)
+    return masks
+
+
+@lru_cache(maxsize=4096)
+def _pattern_regex(pattern: str) -> re.Pattern:
+    """Zero-edit matcher: one character class per confusable character."""
+    parts = []
+    for ch in pattern:
+        aliases = _CONFUSIONS.get(ch, ch)
+        parts.append(re.escape(ch) if len(aliases) == 1 else f"[{re.escape(aliases)}]")
+    return re.compile("".join(parts))
+
+
+def _scan(text: str, pattern: str, limit: int) -> tuple[int, int]:
+    """
+    Lowest edit distance of `pattern` against any substring of `text` and the
+    (inclusive) end index of the first substring reaching it. Returns
+    (limit + 1, -1) if no substring is within `limit` edits.
+    """
+    m = len(pattern)
+    peq = _pattern_masks(pattern)
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv, score = full, 0, m
+    best, best_end = limit + 1, -1
+
+    for j, ch in enumerate(text):
+        eq = peq.get(ch, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & full) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        # Search variant: row 0 stays 0, so nothing is shifted in
+        ph = (ph << 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+        if score < best:
+            best, best_end = score, j
+            if score == 0:
+                break
+
+    return best, best_end
+
+
+def best_match(text: str, pattern: str, limit: int | None = None) -> dict | None:
+    """
+    Best approximate occurrence of `pattern` in `text` (both already
+    normalised, e.g. upper-cased). `limit` defaults to max_edits(len).
+    Returns {'start', 'end', 'edits', 'score', 'text'} with end exclusive and
+    score = 1 - edits / len(pattern), or None if nothing is within `limit`.
+    """
+    if not pattern or not text:
+        return None
+    if limit is None:
+        limit = max_edits(len(pattern))
+
+    m = _pattern_regex(pattern).search(text)
+    if m:
+        return {
+            "start": m.start(),
+            "end": m.end(),
+            "edits": 0,
+            "score": 1.0,
+            "text": m.group(0),
+        }
+    if limit <= 0:
+        return None
+
+    edits, end = _scan(text, pattern, limit)
+    if end < 0:
+        return None
+
+    # The start is found by scanning the reversed pattern backwards from
+    # the end over a window of at most len(pattern) + edits characters
+    lo = max(0, end + 1 - len(pattern) - edits)
+    window = text[lo : end + 1][::-1]
+    _, back = _scan(window, pattern[::-1], edits)
+    start = end - back
+
+    return {
+        "start": start,
+        "end": end + 1,
+        "edits": edits,
+        "score": round(1.0 - edits / len(pattern), 3),
+        "text": text[start : end + 1],
+    }
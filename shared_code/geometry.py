@@ -0,0 +1,88 @@
+# Helpers to map coordinates between the working resolution (after ingest
+# normalisation / downscaling) and the original image resolution.
+
+
+def to_original_box(box: list | None, scale: float) -> list | None:
+    """[x, y, w, h] at working resolution -> original resolution."""
+    if box is None or not scale or scale == 1.0:
+        return box
+    return [int(round(v / scale)) for v in box]
+
+
+def to_original_polygon(poly: list, scale: float) -> list:
+    """[{"x":..,"y":..}, ...] at working resolution -> original resolution."""
+    if not scale or scale == 1.0:
+        return poly
+    return [
+        {
+            **p,
+            "x": int(round(p.get("x", 0) / scale)),
+            "y": int(round(p.get("y", 0) / scale)),
+        }
+        for p in poly
+        if isinstance(p, dict)
+    ]
+
+
+def rescale_ocr_result(
+    ocr_data: dict,
+    scale: float,
+    offset: tuple[int, int] = (0, 0),
+    size: tuple[int, int] | None = None,
+) -> dict:
+    """
+    Maps the boundingPolygon of every OCR line and word from the image sent
+    to the service back to the working image: divides by scale, then adds
+    offset (top-left of the crop that was sent, if any). metadata.width/height
+    are set to size (working width, height) or rescaled. Modifies ocr_data in place.
+    """
+    if not isinstance(ocr_data, dict):
+        return ocr_data
+    dx, dy = offset
+    if (not scale or scale == 1.0) and not dx and not dy and size is None:
+        return ocr_data
+
+    def _map(poly):
+        return [
+            {**p, "x": p.get("x", 0) + dx, "y": p.get("y", 0) + dy}
+            for p in to_original_polygon(poly, scale)
+            if isinstance(p, dict)
+        ]
+
+    metadata = ocr_data.get("metadata")
+    if isinstance(metadata, dict):
+        if size is not None:
+            metadata["width"], metadata["height"] = size
+        else:
+            for key in ("width", "height"):
+                if isinstance(metadata.get(key), (int, float)) and scale:
+                    metadata[key] = int(round(metadata[key] / scale))
+
+    read_result = ocr_data.get("readResult") or {}
+    for block in read_result.get("blocks") or []:
+        for line in block.get("lines") or []:
+            if isinstance(line.get("boundingPolygon"), list):
+                line["boundingPolygon"] = _map(line["boundingPolygon"])
+            for word in line.get("words") or []:
+                if isinstance(word.get("boundingPolygon"), list):
+                    word["boundingPolygon"] = _map(word["boundingPolygon"])
+    return ocr_data
+
+
+def add_original_polygons(ocr_data: dict, scale: float) -> dict:
+    """
+    Sets boundingPolygonOriginal on every OCR line and word: its
+    boundingPolygon (working resolution) mapped back to the uploaded image,
+    like barcodeBoxOriginal in analyze_barcode. Modifies ocr_data in place.
+    """
+    if not isinstance(ocr_data, dict):
+        return ocr_data
+    read_result = ocr_data.get("readResult") or {}
+    for block in read_result.get("blocks") or []:
+        for line in block.get("lines") or []:
+            for item in [line, *(line.get("words") or [])]:
+                if isinstance(item.get("boundingPolygon"), list):
+                    item["boundingPolygonOriginal"] = to_original_polygon(
+                        item["boundingPolygon"], scale
+                    )
+    return ocr_data
@@ -0,0 +1,165 @@
+import re
+
+# GS1 Application Identifier (AI) parsing for DataMatrix / GS1-128 content.
+# ZXing returns GS1 codes either as human-readable text ("(01)...(17)...")
+# or as the raw element string, where variable-length fields are ended by
+# FNC1 (transmitted as the GS character, 0x1D) and a "]d2"/"]C1"/"]Q3"
+# symbology identifier may lead.
+GS = "\x1d"
+
+_SYMBOLOGY_PREFIXES = ("]d2", "]C1", "]Q3", "]e0", "]J1")
+
+# AI length (digits) by the first two digits of the AI
+_AI_DIGITS = {
+    **{f"{i:02d}": 2 for i in range(0, 23)},
+    "23": 3,
+    "24": 3,
+    "25": 3,
+    "30": 2,
+    **{f"{i}": 4 for i in range(31, 37)},
+    "37": 2,
+    "39": 4,
+    "40": 3,
+    "41": 3,
+    "42": 3,
+    "43": 4,
+    "70": 4,
+    "71": 3,
+    "72": 4,
+    "80": 4,
+    "81": 4,
+    "82": 4,
+    **{f"{i}": 2 for i in range(90, 100)},
+}
+
+# Fixed data length (digits after the AI) by the first two digits; every
+# other AI is variable-length and ends at FNC1 or at the end of the data
+_FIXED_LENGTH = {
+    "00": 18,
+    "01": 14,
+    "02": 14,
+    "03": 14,
+    "04": 16,
+    **{f"{i}": 6 for i in range(11, 20)},
+    "20": 2,
+    **{f"{i}": 6 for i in range(31, 37)},
+    "41": 13,
+}
+
+# Fields the validation uses, by AI
+GS1_FIELDS = {
+    "01": "gtin",
+    "10": "lot",
+    "11": "prodDate",
+    "17": "expDate",
+    "21": "serial",
+}
+
+_HRI = re.compile(r"\((\d{2,4})\)([^(]*)")
+
+
+def _parse_hri(text: str) -> dict | None:
+    """'(01)0779...(17)270731(10)S101144' -> {'01': ..., '17': ..., '10': ...}"""
+    if not text.startswith("("):
+        return None
+    elements = {}
+    pos = 0
+    for m in _HRI.finditer(text):
+        if m.start() != pos:
+            return None
+        elements[m.group(1)] = m.group(2).strip()
+        pos = m.end()
+    return elements if pos == len(text) and elements else None
+
+
+def _parse_raw(data: str) -> dict | None:
+    """Raw element string (FNC1 as GS) -> {AI: value}; None if it is not GS1."""
+    elements = {}
+    pos = 0
+    while pos < len(data):
+        if data[pos] == GS:
+            pos += 1
+            continue
+        ai_digits = _AI_DIGITS.get(data[pos : pos + 2])
+        ai = data[pos : pos + ai_digits] if ai_digits else ""
+        if not ai_digits or len(ai) != ai_digits or not ai.isdigit():
+            return None
+        pos += ai_digits
+
+        fixed = _FIXED_LENGTH.get(ai[:2])
+        if fixed:
+            value = data[pos : pos + fixed]
+            if len(value) != fixed or not value.isdigit():
+                return None
+            pos += fixed
+        else:
+            end = data.find(GS, pos)
+            end = len(data) if end < 0 else end
+            value = data[pos:end]
+            pos = end
+        elements[ai] = value
+    return elements or None
+
+
+def parse(value: str | None) -> dict | None:
+    """
+    Parses GS1 content into {AI: value}. Returns None when the text is not a
+    GS1 element string (e.g. a plain EAN-13 or Code 128 payload).
+    """
+    text = (value or "").strip()
+    flagged = GS in text
+    for prefix in _SYMBOLOGY_PREFIXES:
+        if text.startswith(prefix):
+            text = text[len(prefix) :]
+            flagged = True
+            break
+    if not text:
+        return None
+
+    elements = _parse_hri(text)
+    if elements is None and (flagged or (text.startswith("01") and len(text) >= 16)):
+        # Without a GS1 marker only a leading (01) GTIN is trusted, so that
+        # a bare EAN-13 such as "1234567890128" is not read as (12)(90)
+        elements = _parse_raw(text)
+    return elements
+
+
+def parse_date(value: str | None) -> dict | None:
+    """
+    GS1 YYMMDD date -> {'year', 'month', 'day'}; day 00 means "end of month"
+    and is returned as None. Years are taken in the 2000-2099 window.
+    """
+    if not value or len(value) != 6 or not value.isdigit():
+        return None
+    year, month, day = 2000 + int(value[:2]), int(value[2:4]), int(value[4:])
+    if not 1 <= month <= 12 or day > 31:
+        return None
+    return {"year": year, "month": month, "day": day or None}
+
+
+def check_digit_ok(gtin: str | None) -> bool:
+    """Mod-10 check digit of a GTIN-8/12/13/14."""
+    if not gtin or not gtin.isdigit() or len(gtin) not in (8, 12, 13, 14):
+        return False
+    digits = [int(c) for c in gtin]
+    total = sum(
+        d * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(digits[:-1]))
+    )
+    return (10 - total % 10) % 10 == digits[-1]
+
+
+def fields(value: str | None) -> dict | None:
+    """
+    Named fields of a GS1 barcode: {'gtin', 'gtinValid', 'lot', 'expDate',
+    'prodDate', 'serial', 'elements'}; dates are parsed with parse_date.
+    None if the content is not GS1.
+    """
+    elements = parse(value)
+    if not elements:
+        return None
+    out = {name: elements.get(ai) for ai, name in GS1_FIELDS.items()}
+    out["expDate"] = parse_date(out["expDate"])
+    out["prodDate"] = parse_date(out["prodDate"])
+    out["gtinValid"] = check_digit_ok(out["gtin"]) if out["gtin"] else None
+    out["elements"] = elements
+    return out
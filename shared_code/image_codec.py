@@ -0,0 +1,139 @@
+import io
+import os
+
+import cv2
+import numpy as np
+
+from shared_code.image_ops import to_gray
+
+# Codec policy per container (Function App settings):
+# - work:   throwaway intermediates -> fast lossless PNG or raw .npy only, so
+#           stages (and fused vs chained enhancement) stay pixel-identical
+# - output: artifacts that people look at -> tuned PNG, WebP or JPEG
+CODEC_POLICY = {
+    "work": {
+        "format": os.getenv("WORK_IMAGE_FORMAT", "png").strip().lower(),
+        "pngCompression": int(os.getenv("WORK_PNG_COMPRESSION", "1")),
+    },
+    "output": {
+        "format": os.getenv("OUTPUT_IMAGE_FORMAT", "png").strip().lower(),
+        "pngCompression": int(os.getenv("OUTPUT_PNG_COMPRESSION", "3")),
+        "quality": int(os.getenv("OUTPUT_IMAGE_QUALITY", "90")),
+    },
+}
+
+_DEFAULT_POLICY = {"format": "png", "pngCompression": 1, "quality": 95}
+
+# Lossless formats accepted for intermediates
+_WORK_FORMATS = ("png", "npy")
+
+_EXTENSIONS = {"png": ".png", "webp": ".webp", "jpeg": ".jpg", "npy": ".npy"}
+_CONTENT_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "npy": "application/octet-stream",
+}
+_NPY_MAGIC = b"\x93NUMPY"
+
+
+def policy_for(container: str) -> dict:
+    """Returns the codec policy configured for a container."""
+    policy = CODEC_POLICY.get(container, _DEFAULT_POLICY)
+    if policy["format"] not in _EXTENSIONS:
+        raise ValueError(f"Unsupported image format for '{container}': {policy}")
+    if container == "work" and policy["format"] not in _WORK_FORMATS:
+        # A lossy intermediate would change every later stage
+        raise ValueError(f"The 'work' container only accepts png or npy: {policy}")
+    if container == "output" and policy["format"] == "npy":
+        # Output blobs are served to clients and reports; they must be images
+        raise ValueError("The 'output' container does not accept .npy blobs")
+    return policy
+
+
+def extension_for(container: str) -> str:
+    """File extension (with dot) of the blobs written to a container."""
+    return _EXTENSIONS[policy_for(container)["format"]]
+
+
+def format_of_blob(blob_name: str) -> str | None:
+    """Infers the codec from the blob extension ('png', 'npy', ...)."""
+    ext = os.path.splitext(blob_name)[1].lower()
+    if ext == ".jpeg":
+        return "jpeg"
+    for fmt, known_ext in _EXTENSIONS.items():
+        if ext == known_ext:
+            return fmt
+    return None
+
+
+def encode_png(img: np.ndarray, compression: int | None = None) -> bytes:
+    """Encodes an OpenCV image to a PNG byte buffer."""
+    params = [] if compression is None else [cv2.IMWRITE_PNG_COMPRESSION, compression]
+    ok, buf = cv2.imencode(".png", img, params)
+    if not ok:
+        raise RuntimeError("Failed to encode PNG")
+    return buf.tobytes()
+
+
+def encode_image(img: np.ndarray, container: str) -> tuple[bytes, str, str]:
+    """
+    Encodes an image following the container policy.
+    Returns (data, extension, content_type).
+    """
+    policy = policy_for(container)
+    fmt = policy["format"]
+
+    if fmt == "npy":
+        # Raw array with the small .npy header (dtype + shape); no compression
+        bio = io.BytesIO()
+        np.save(bio, np.ascontiguousarray(img), allow_pickle=False)
+        data = bio.getvalue()
+    elif fmt == "png":
+        data = encode_png(img, policy["pngCompression"])
+    else:
+        quality_flag = (
+            cv2.IMWRITE_WEBP_QUALITY if fmt == "webp" else cv2.IMWRITE_JPEG_QUALITY
+        )
+        ok, buf = cv2.imencode(
+            _EXTENSIONS[fmt], img, [int(quality_flag), policy["quality"]]
+        )
+        if not ok:
+            raise RuntimeError(f"Failed to encode {fmt.upper()}")
+        data = buf.tobytes()
+
+    return data, _EXTENSIONS[fmt], _CONTENT_TYPES[fmt]
+
+
+def decode_image(raw: bytes, flags: int = cv2.IMREAD_COLOR) -> np.ndarray | None:
+    """
+    Decodes PNG/JPEG/WebP (via OpenCV) or .npy intermediates.
+    flags: cv2.IMREAD_COLOR or cv2.IMREAD_GRAYSCALE.
+    Returns None if the buffer cannot be decoded.
+    """
+    if is_npy(raw):
+        try:
+            img = np.load(io.BytesIO(raw), allow_pickle=False)
+        except Exception:
+            return None
+        if flags == cv2.IMREAD_GRAYSCALE and img.ndim == 3:
+            return to_gray(img)
+        if flags == cv2.IMREAD_COLOR and img.ndim == 2:
+            return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        return img
+    return cv2.imdecode(np.frombuffer(raw, np.uint8), flags)
+
+
+def decode_bgr(raw: bytes) -> np.ndarray | None:
+    """Decodes a byte buffer to a BGR image (None if it cannot be decoded)."""
+    return decode_image(raw, cv2.IMREAD_COLOR)
+
+
+def decode_gray(raw: bytes) -> np.ndarray | None:
+    """Decodes a byte buffer straight to a single-channel uint8 image."""
+    return decode_image(raw, cv2.IMREAD_GRAYSCALE)
+
+
+def is_npy(raw: bytes) -> bool:
+    """True if the buffer is a raw .npy intermediate rather than an image file."""
+    return raw[: len(_NPY_MAGIC)] == _NPY_MAGIC
@@ -0,0 +1,191 @@
+import os
+
+import cv2
+import numpy as np
+
+from shared_code import tiled_ops
+
+# Parameters of the enhance_focus stage (fixed, tuned for packaging photos)
+FOCUS_BLUR_SIGMA = 2.5
+FOCUS_CLAHE_CLIP = 2.0
+FOCUS_CLAHE_TILE = 8
+
+# clipLimit: Threshold to limit contrast. Higher values give more contrast.
+# tileGridSize: Size of the region for histogram analysis.
+ADJ_CLAHE_CLIP = float(os.getenv("ADJ_CLAHE_CLIP", "2.0"))
+ADJ_CLAHE_TILE = int(os.getenv("ADJ_CLAHE_TILE", "8"))
+
+# Fixed-point weights used by libpng's rgb_to_gray (0.299, 0.587 scaled by 2^15).
+# cv2.imdecode(..., IMREAD_GRAYSCALE) on a color PNG goes through this path,
+# so we reproduce it to stay bit-exact with the chained pipeline.
+_PNG_GRAY_R = 9797
+_PNG_GRAY_G = 19234
+_PNG_GRAY_B = 32768 - _PNG_GRAY_R - _PNG_GRAY_G
+
+
+def var_laplacian(img_gray: np.ndarray) -> float:
+    """Calculates the variance of the Laplacian to measure the blur level."""
+    return cv2.Laplacian(img_gray, cv2.CV_64F).var()
+
+
+def sharpen_amount(blur_metric: float) -> float:
+    """
+    Maps the blur metric to an Unsharp Mask 'amount'.
+    A higher 'amount' value means more aggressive sharpening.
+    """
+    if blur_metric < 20:
+        return 1.8  # High blur -> strong sharpening
+    if blur_metric < 60:
+        return 1.5
+    if blur_metric < 120:
+        return 1.2
+    return 0.8  # Sharp image -> gentle sharpening
+
+
+def enhance_focus(bgr: np.ndarray) -> np.ndarray:
+    """
+    Adaptive Unsharp Masking + CLAHE on the lightness (L) channel of LAB.
+    Returns a new BGR image; colors (A, B) are left untouched.
+    Very large images are processed strip-wise and IN PLACE (see tiled_ops).
+    """
+    if tiled_ops.should_tile(bgr):
+        return _enhance_focus_tiled(bgr)
+
+    # 1) Measure blur in the grayscale version to decide sharpening intensity
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    amount = sharpen_amount(var_laplacian(gray))
+
+    # 2) Convert to LAB color space to separate lightness (L) from color (A, B)
+    lab = cv2.cvtColor(bgr, cv2.COLOR_BGR2LAB)
+    l_channel, a_channel, b_channel = cv2.split(lab)
+
+    # 3) Apply Unsharp Mask ONLY to the lightness (L) channel
+    l_channel_f32 = l_channel.astype(np.float32)
+    blurred_l = cv2.GaussianBlur(l_channel_f32, (0, 0), FOCUS_BLUR_SIGMA)
+    sharpened_l = cv2.addWeighted(l_channel_f32, 1.0 + amount, blurred_l, -amount, 0)
+
+    # 4) Apply CLAHE to improve local contrast in the lightness channel
+    clahe = cv2.createCLAHE(
+        clipLimit=FOCUS_CLAHE_CLIP,
+        tileGridSize=(FOCUS_CLAHE_TILE, FOCUS_CLAHE_TILE),
+    )
+    sharpened_l_u8 = np.clip(sharpened_l, 0, 255).astype(np.uint8)
+    enhanced_l = clahe.apply(sharpened_l_u8)
+
+    # 5) Recombine the channels and convert back to BGR
+    merged_lab = cv2.merge([enhanced_l, a_channel, b_channel])
+    return cv2.cvtColor(merged_lab, cv2.COLOR_LAB2BGR)
+
+
+def adjust_contrast(
+    bgr: np.ndarray,
+    clip_limit: float = ADJ_CLAHE_CLIP,
+    tile_size: int = ADJ_CLAHE_TILE,
+) -> np.ndarray:
+    """
+    CLAHE on the lightness (L) channel of LAB.
+    Improves local contrast without distorting colors.
+    Very large images are processed strip-wise and IN PLACE (see tiled_ops).
+    """
+    if tiled_ops.should_tile(bgr):
+        l_plane = tiled_ops.lightness(bgr)
+        enhanced_l = tiled_ops.clahe(
+            l_plane, np.empty_like(l_plane), clip_limit, tile_size
+        )
+        del l_plane
+        return tiled_ops.replace_lightness(bgr, enhanced_l)
+
+    lab_img = cv2.cvtColor(bgr, cv2.COLOR_BGR2LAB)
+    l_channel, a_channel, b_channel = cv2.split(lab_img)
+
+    clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tile_size, tile_size))
+    enhanced_l_channel = clahe.apply(l_channel)
+
+    merged_lab_img = cv2.merge([enhanced_l_channel, a_channel, b_channel])
+    return cv2.cvtColor(merged_lab_img, cv2.COLOR_LAB2BGR)
+
+
+def to_gray(bgr: np.ndarray) -> np.ndarray:
+    """
+    BGR -> grayscale, bit-exact with decoding a color PNG using
+    cv2.IMREAD_GRAYSCALE (libpng rgb_to_gray, truncating fixed point).
+    """
+    rows, cols = bgr.shape[:2]
+    out = np.empty((rows, cols), np.uint8)
+
+    # Row strips keep the uint32 accumulator small on large images
+    def _gray(y0, y1):
+        strip = bgr[y0:y1]
+        acc = strip[..., 2].astype(np.uint32) * _PNG_GRAY_R
+        acc += strip[..., 1].astype(np.uint32) * _PNG_GRAY_G
+        acc += strip[..., 0].astype(np.uint32) * _PNG_GRAY_B
+        acc >>= 15
+        out[y0:y1] = acc
+
+    tiled_ops.for_each_strip(rows, cols, _gray)
+    return out
+
+
+def enhance_luminance(
+    gray: np.ndarray,
+    clip_limit: float = ADJ_CLAHE_CLIP,
+    tile_size: int = ADJ_CLAHE_TILE,
+    focus: bool = True,
+    contrast: bool = True,
+) -> np.ndarray:
+    """
+    Luminance-only equivalent of enhance_focus + adjust_contrast + to_gray.
+    Runs Unsharp Masking and both CLAHE passes on a single plane, so no
+    LAB/BGR intermediates are allocated. Output is close to, but not
+    bit-exact with, the color path (luma instead of LAB lightness).
+    focus / contrast select the enhance_focus and adjust_contrast steps.
+    Very large images are processed strip-wise; gray may then be overwritten.
+    """
+    tiled = tiled_ops.should_tile(gray)
+
+    if focus:
+        if tiled:
+            amount = sharpen_amount(tiled_ops.laplacian_variance(gray))
+            sharpened = tiled_ops.unsharp(gray, amount, FOCUS_BLUR_SIGMA, saturate=True)
+            gray = tiled_ops.clahe(sharpened, gray, FOCUS_CLAHE_CLIP, FOCUS_CLAHE_TILE)
+        else:
+            amount = sharpen_amount(var_laplacian(gray))
+
+            # Unsharp Mask: one float32 copy plus the blurred plane, saturated to uint8
+            gray_f32 = gray.astype(np.float32)
+            blurred = cv2.GaussianBlur(gray_f32, (0, 0), FOCUS_BLUR_SIGMA)
+            sharpened = cv2.addWeighted(
+                gray_f32, 1.0 + amount, blurred, -amount, 0, dtype=cv2.CV_8U
+            )
+            del gray_f32, blurred
+
+            focus_clahe = cv2.createCLAHE(
+                clipLimit=FOCUS_CLAHE_CLIP,
+                tileGridSize=(FOCUS_CLAHE_TILE, FOCUS_CLAHE_TILE),
+            )
+            gray = focus_clahe.apply(sharpened)
+        del sharpened
+
+    if contrast:
+        if tiled:
+            gray = tiled_ops.clahe(gray, np.empty_like(gray), clip_limit, tile_size)
+        else:
+            adj_clahe = cv2.createCLAHE(
+                clipLimit=clip_limit, tileGridSize=(tile_size, tile_size)
+            )
+            gray = adj_clahe.apply(gray)
+
+    return gray
+
+
+def _enhance_focus_tiled(bgr: np.ndarray) -> np.ndarray:
+    """Strip-wise enhance_focus: only uint8 planes are kept at full size."""
+    amount = sharpen_amount(tiled_ops.laplacian_variance(bgr))
+    l_plane = tiled_ops.lightness(bgr)
+    sharpened_l = tiled_ops.unsharp(l_plane, amount, FOCUS_BLUR_SIGMA)
+    # l_plane is no longer needed: reuse it as CLAHE destination
+    enhanced_l = tiled_ops.clahe(
+        sharpened_l, l_plane, FOCUS_CLAHE_CLIP, FOCUS_CLAHE_TILE
+    )
+    del sharpened_l
+    return tiled_ops.replace_lightness(bgr, enhanced_l)
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import logging
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+from shared_code.ocr_client import OCR_API_VERSION, OCR_FEATURES
+from shared_code.storage_util import (
+    delete_blob,
+    download_bytes,
+    get_properties,
+    list_blobs,
+    upload_bytes,
+)
+
+logger = logging.getLogger(__name__)
+
+# OCR responses cached in work/ocr-cache/, keyed by the SHA-256 of the exact
+# bytes sent plus the API version and features, so identical re-submissions
+# (operator retries, re-validation with new expectedData) skip the service.
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "true").strip().lower() == "true"
+OCR_CACHE_TTL_HOURS = float(os.getenv("OCR_CACHE_TTL_HOURS", "168"))
+OCR_CACHE_MAX_MB = float(os.getenv("OCR_CACHE_MAX_MB", "512"))
+# Fraction of writes that also run the size/TTL eviction sweep (listing the
+# prefix on every write would cost more than the cache saves)
+OCR_CACHE_EVICT_SAMPLE = float(os.getenv("OCR_CACHE_EVICT_SAMPLE", "0.05"))
+
+CACHE_CONTAINER = "work"
+CACHE_PREFIX = "ocr-cache/"
+
+
+def ocr_cache_key(image_bytes: bytes) -> str:
+    """Key of an OCR call: content of the upload + API version + features."""
+    h = hashlib.sha256(image_bytes)
+    h.update(f"|{OCR_API_VERSION}|{OCR_FEATURES}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _blob_name(key: str) -> str:
+    return f"{CACHE_PREFIX}{key}.json"
+
+
+def _expired(last_modified: datetime | None, now: datetime) -> bool:
+    if OCR_CACHE_TTL_HOURS <= 0 or last_modified is None:
+        return False
+    return now - last_modified > timedelta(hours=OCR_CACHE_TTL_HOURS)
+
+
+def get_cached(key: str) -> dict | None:
+    """Cached OCR response, or None on a miss or an expired entry."""
+    if not OCR_CACHE_ENABLED:
+        return None
+    blob_name = _blob_name(key)
+    props = get_properties(CACHE_CONTAINER, blob_name)
+    if props is None:
+        return None
+    if _expired(props.last_modified, datetime.now(timezone.utc)):
+        logger.info("ocr cache entry expired: %s", blob_name)
+        delete_blob(CACHE_CONTAINER, blob_name)
+        return None
+    try:
+        return json.loads(download_bytes(CACHE_CONTAINER, blob_name))
+    except Exception:
+        logger.warning("unreadable ocr cache entry: %s", blob_name, exc_info=True)
+        return None
+
+
+def put_cached(key: str, ocr_data: dict) -> None:
+    """
+    Stores a successful OCR response (error payloads are never cached) and,
+    for a sample of writes, evicts expired entries and the oldest ones until
+    the cache fits in OCR_CACHE_MAX_MB.
+    """
+    if not OCR_CACHE_ENABLED or not isinstance(ocr_data, dict):
+        return
+    if "error" in ocr_data or "readResult" not in ocr_data:
+        return
+    data = json.dumps(ocr_data, ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+    upload_bytes(CACHE_CONTAINER, _blob_name(key), data, "application/json")
+    if random.random() < OCR_CACHE_EVICT_SAMPLE:
+        evict()
+
+
+def evict() -> int:
+    """TTL + size-based (oldest first) eviction. Returns the blobs deleted."""
+    now = datetime.now(timezone.utc)
+    entries = sorted(
+        list_blobs(CACHE_CONTAINER, CACHE_PREFIX),
+        key=lambda b: b.last_modified or now,
+    )
+    budget = OCR_CACHE_MAX_MB * 1024 * 1024
+    total = sum(b.size or 0 for b in entries)
+    deleted = 0
+    for b in entries:
+        over_budget = OCR_CACHE_MAX_MB > 0 and total > budget
+        if not over_budget and not _expired(b.last_modified, now):
+            continue
+        delete_blob(CACHE_CONTAINER, b.name)
+        total -= b.size or 0
+        deleted += 1
+    if deleted:
+        logger.info("ocr cache eviction removed %d entries", deleted)
+    return deleted
@@ -0,0 +1,157 @@
+import asyncio
+import email.utils
+import json
+import logging
+import os
+import random
+import time
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+AZURE_OCR_ENDPOINT = os.environ["AZURE_OCR_ENDPOINT"].rstrip("/")
+AZURE_OCR_KEY = os.environ["AZURE_OCR_KEY"]
+
+OCR_API_VERSION = "2023-10-01"
+OCR_FEATURES = "read"
+
+# Client tuning (Function App settings)
+OCR_TIMEOUT_S = float(os.getenv("OCR_TIMEOUT_S", "30"))
+OCR_MAX_RETRIES = int(os.getenv("OCR_MAX_RETRIES", "4"))
+OCR_BACKOFF_BASE_S = float(os.getenv("OCR_BACKOFF_BASE_S", "0.5"))
+OCR_BACKOFF_MAX_S = float(os.getenv("OCR_BACKOFF_MAX_S", "20"))
+OCR_POOL_SIZE = int(os.getenv("OCR_POOL_SIZE", "16"))
+
+# Throttling (429) and transient server errors are retried
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class OcrServiceError(RuntimeError):
+    """The OCR service kept failing after all retries."""
+
+
+# Keep-alive aiohttp session reused by every invocation of the worker process;
+# created on first use because it must be bound to the worker's running event loop
+_aio_session: aiohttp.ClientSession | None = None
+
+
+def _get_aio_session() -> aiohttp.ClientSession:
+    global _aio_session
+    if _aio_session is None or _aio_session.closed:
+        _aio_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=OCR_POOL_SIZE),
+            headers={"Ocp-Apim-Subscription-Key": AZURE_OCR_KEY},
+            timeout=aiohttp.ClientTimeout(total=OCR_TIMEOUT_S),
+        )
+    return _aio_session
+
+
+def analyze_url() -> str:
+    """Image Analysis endpoint used for OCR."""
+    return (
+        f"{AZURE_OCR_ENDPOINT}/computervision/imageanalysis:analyze"
+        f"?api-version={OCR_API_VERSION}&features={OCR_FEATURES}"
+    )
+
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """Parses a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def backoff_delay(attempt: int, retry_after: float | None) -> float:
+    """
+    Seconds to wait before retry number `attempt` (1-based). Retry-After wins
+    when present; otherwise exponential backoff with full jitter. Both capped.
+    """
+    if retry_after is not None:
+        return min(retry_after, OCR_BACKOFF_MAX_S)
+    ceiling = min(OCR_BACKOFF_MAX_S, OCR_BACKOFF_BASE_S * (2 ** (attempt - 1)))
+    return random.uniform(0, ceiling)
+
+
+def parse_response(status: int, text: str, json_fn) -> dict:
+    """OCR JSON, or the same error payload shape the pipeline always used."""
+    try:
+        return json_fn()
+    except Exception:
+        return {"error": {"code": str(status), "message": text}}
+
+
+async def analyze_async(image_bytes: bytes) -> tuple[dict, dict]:
+    """
+    Sends the image to Azure Computer Vision (read) over the pooled aiohttp
+    session. Retries 429/5xx and connection errors with bounded backoff that
+    honours Retry-After; the request and the backoff sleeps yield to the event
+    loop, so one worker can keep many OCR calls in flight. Returns
+    (ocr_json, metrics); raises OcrServiceError if the service is still
+    throttling/failing after OCR_MAX_RETRIES retries. Non-retryable errors
+    (e.g. 400) come back as {"error": {...}}.
+    """
+    session = _get_aio_session()
+    attempts = []
+    waited = 0.0
+    started = time.perf_counter()
+
+    for attempt in range(OCR_MAX_RETRIES + 1):
+        t0 = time.perf_counter()
+        status, retry_after, error, text = None, None, None, ""
+        try:
+            async with session.post(
+                analyze_url(),
+                headers={"Content-Type": "application/octet-stream"},
+                data=image_bytes,
+            ) as resp:
+                status = resp.status
+                retry_after = retry_after_seconds(resp.headers.get("Retry-After"))
+                text = await resp.text()
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            error = e
+        attempts.append(
+            {"status": status, "latencyMs": round((time.perf_counter() - t0) * 1000)}
+        )
+
+        if error is None and status not in RETRY_STATUSES:
+            metrics = _metrics(attempts, waited, started)
+            logger.info("OCR call metrics: %s", metrics)
+            return parse_response(status, text, lambda: json.loads(text)), metrics
+
+        if attempt == OCR_MAX_RETRIES:
+            break
+        delay = backoff_delay(attempt + 1, retry_after)
+        logger.warning(
+            "OCR attempt %d failed (%s); retrying in %.2fs",
+            attempt + 1,
+            status or error,
+            delay,
+        )
+        await asyncio.sleep(delay)
+        waited += delay
+
+    metrics = _metrics(attempts, waited, started)
+    logger.error("OCR service unavailable after retries: %s", metrics)
+    raise OcrServiceError(
+        f"OCR failed after {len(attempts)} attempts "
+        f"(last status {attempts[-1]['status']})"
+    )
+
+
+def _metrics(attempts: list[dict], waited: float, started: float) -> dict:
+    return {
+        "attempts": len(attempts),
+        "status": attempts[-1]["status"],
+        "latencyMs": round((time.perf_counter() - started) * 1000),
+        "retryWaitMs": round(waited * 1000),
+        "attemptLatenciesMs": [a["latencyMs"] for a in attempts],
+    }
@@ -0,0 +1,280 @@
+import os
+import re
+
+from shared_code.dates import extract_dates, normalise
+from shared_code.fuzzy_match import best_match, fold, max_edits
+
+# Per-run index of OCR lines for field lookup. Each line keeps its text and
+# bounding box; an inverted index maps character trigrams (of the line text
+# without spaces, with confusable characters folded) to line ids, so a field
+# only verifies the few lines that share enough trigrams with its value
+# instead of scanning the whole flattened text. Label words ("LOTE", "VENC",
+# ...) are indexed too, so values can be required to sit next to their label.
+#
+# OCR_LABEL_PROXIMITY: "prefer" (default) picks the candidate next to a label
+#                      and reports it; "require" rejects values that are not
+#                      next to the field's label when that label was read;
+#                      "off" ignores labels.
+# OCR_LABEL_MAX_GAP:   how far (in label line heights) a value may sit
+#                      below or to the right of its label. Each label is
+#                      paired with one value line only (the nearest one).
+LABEL_PROXIMITY = os.getenv("OCR_LABEL_PROXIMITY", "prefer").strip().lower()
+LABEL_MAX_GAP = float(os.getenv("OCR_LABEL_MAX_GAP", "1.5"))
+
+NGRAM = 3
+
+# Printed labels per expected field (cartons often use the single letter)
+FIELD_LABELS = {
+    "lot": ("LOTE", "LOT", "L"),
+    "expDate": ("VENC", "VTO", "EXP", "V"),
+    "packDate": ("ELAB", "FAB", "MFG", "E"),
+}
+
+_LABEL_STRIP = re.compile(r"[^A-Z0-9]")
+
+
+def _bbox(poly: list | None) -> tuple[float, float, float, float] | None:
+    """Axis-aligned (x1, y1, x2, y2) of a list of {'x', 'y'} points."""
+    points = [p for p in poly or [] if isinstance(p, dict) and "x" in p]
+    if not points:
+        return None
+    xs = [p["x"] for p in points]
+    ys = [p["y"] for p in points]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def _grams(text: str) -> set[str]:
+    return {text[i : i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+def build_index(ocr_result: dict) -> dict:
+    """
+    Index of one OCR result:
+    {'lines': [{'text', 'ns', 'bbox'}], 'grams': {trigram: {line ids}},
+     'labels': {label word: [(line id, word bbox)]}}
+    Text is upper-cased; 'ns' is the line text without whitespace.
+    """
+    lines, grams, labels = [], {}, {}
+    blocks = ((ocr_result or {}).get("readResult") or {}).get("blocks") or []
+    for blk in blocks:
+        for ln in blk.get("lines") or []:
+            text = (ln.get("text") or "").upper().strip()
+            if not text:
+                continue
+            line_id = len(lines)
+            line_box = _bbox(ln.get("boundingPolygon"))
+            ns = "".join(text.split())
+            lines.append({"text": text, "ns": ns, "bbox": line_box})
+
+            for gram in _grams(fold(ns)):
+                grams.setdefault(gram, set()).add(line_id)
+
+            # Words carry their own polygon; older payloads only have lines
+            words = ln.get("words") or [
+                {"text": w, "boundingPolygon": None} for w in text.split()
+            ]
+            for word in words:
+                token = _LABEL_STRIP.sub("", (word.get("text") or "").upper())
+                if token:
+                    box = _bbox(word.get("boundingPolygon")) or line_box
+                    labels.setdefault(token, []).append((line_id, box))
+
+    return {"lines": lines, "grams": grams, "labels": labels}
+
+
+def full_text(index: dict) -> str:
+    """All line texts joined with spaces (the flat surface used as fallback)."""
+    return " ".join(line["text"] for line in index["lines"])
+
+
+def _candidate_lines(index: dict, folded: str, edits: int) -> list[int]:
+    """
+    Lines sharing enough trigrams with the value to hold it within `edits`
+    (q-gram lemma: each edit destroys at most NGRAM trigrams). Values too
+    short to have trigrams fall back to every line.
+    """
+    needle_grams = _grams(folded)
+    needed = len(needle_grams) - NGRAM * edits
+    if needed <= 0:
+        return list(range(len(index["lines"])))
+
+    counts = {}
+    for gram in needle_grams:
+        for line_id in index["grams"].get(gram, ()):
+            counts[line_id] = counts.get(line_id, 0) + 1
+    return sorted(line_id for line_id, n in counts.items() if n >= needed)
+
+
+def _label_boxes(index: dict, field: str | None) -> list[tuple[int, tuple]]:
+    boxes = []
+    for label in FIELD_LABELS.get(field, ()):
+        boxes.extend(index["labels"].get(label, ()))
+    return boxes
+
+
+def _label_only(line: dict, labels: tuple[str, ...]) -> bool:
+    """True if nothing follows the label on its line ('VENC.', 'FECHA VTO')."""
+    tokens = [_LABEL_STRIP.sub("", w) for w in line["text"].split()]
+    tokens = [t for t in tokens if t]
+    return bool(tokens) and tokens[-1] in labels
+
+
+def _value_lines(index: dict, field: str) -> set[int]:
+    """
+    Lines holding the value of each label of the field: the label's own line
+    when the value follows it there, else the nearest line starting right of
+    or just below it. Lines carrying another field's label never qualify, so
+    "E JUL/2027" under "V JUL/2028" is not the expiry date.
+    """
+    cache = index.setdefault("valueLines", {})
+    if field in cache:
+        return cache[field]
+
+    lines = index["lines"]
+    other = {
+        line_id
+        for name in FIELD_LABELS
+        if name != field
+        for line_id, _ in _label_boxes(index, name)
+    }
+    values = set()
+    for label_line, label_box in _label_boxes(index, field):
+        if not _label_only(lines[label_line], FIELD_LABELS[field]):
+            values.add(label_line)
+            continue
+        if not label_box:
+            continue
+        height = max(1.0, label_box[3] - label_box[1])
+        reach = LABEL_MAX_GAP * height
+        nearest = None
+        for line_id, line in enumerate(lines):
+            box = line["bbox"]
+            if line_id == label_line or line_id in other or not box:
+                continue
+            # Same row: vertically overlapping, starting after the label
+            same_row = box[1] < label_box[3] and box[3] > label_box[1]
+            right = same_row and label_box[0] <= box[0] <= label_box[2] + reach * 4
+            # Next row: starts within the gap below, horizontally overlapping
+            below = label_box[1] < box[1] <= label_box[3] + reach
+            below = below and box[0] < label_box[2] + height and box[2] > label_box[0]
+            if right or below:
+                dist = abs(box[1] - label_box[1]) + max(0.0, box[0] - label_box[2])
+                if nearest is None or dist < nearest[0]:
+                    nearest = (dist, line_id)
+        if nearest:
+            values.add(nearest[1])
+
+    cache[field] = values
+    return values
+
+
+def label_found(index: dict, field: str | None) -> bool:
+    """True if any label of the field was read."""
+    return bool(_label_boxes(index, field))
+
+
+def _line_matches(index: dict, ndl: str) -> list[tuple[int, dict]]:
+    """Best match of an upper-cased value in every candidate line."""
+    ns = "".join(ndl.split())
+    limit = max_edits(len(ns))
+    matches = []
+    for line_id in _candidate_lines(index, fold(ns), limit):
+        line = index["lines"][line_id]
+        match = best_match(line["text"], ndl, limit)
+        if match:
+            match["surface"] = "line"
+        if not match or match["edits"]:
+            match_ns = best_match(line["ns"], ns, limit)
+            if match_ns and (not match or match_ns["edits"] < match["edits"]):
+                match = {**match_ns, "surface": "lineNoSpaces"}
+        if match:
+            matches.append((line_id, match))
+    return matches
+
+
+def find(index: dict, needle: str, field: str | None = None) -> dict | None:
+    """
+    Best line holding `needle` (as-is or without spaces, with the confusion
+    and edit tolerance of fuzzy_match). With a field name, candidates next
+    to one of its labels win; in "require" mode they are the only accepted
+    ones when a label was read. Returns the fuzzy match (span relative to
+    the line 'surface') plus 'line', 'lineText', 'bbox' and 'nearLabel'
+    (None when no label of the field was read), or None. Values whose
+    first word is one of the field's labels are retried without it.
+    """
+    ndl = (needle or "").upper().strip()
+    if not ndl or not index["lines"]:
+        return None
+
+    matches = _line_matches(index, ndl)
+    # Expected values may carry their own label ("V JUL/2027") while the
+    # carton prints another one ("VENC JUL/2027"): retry without it
+    head, _, rest = ndl.partition(" ")
+    if not matches and rest and head in FIELD_LABELS.get(field, ()):
+        matches = _line_matches(index, rest.strip())
+    if not matches:
+        return None
+
+    return _pick(index, matches, field)
+
+
+def _pick(index: dict, matches: list[tuple[int, dict]], field: str | None):
+    """Best (line, match): next to a label first, then fewest edits."""
+    labels = _label_boxes(index, field) if LABEL_PROXIMITY != "off" else []
+    values = _value_lines(index, field) if labels else set()
+    ranked = []
+    for line_id, match in matches:
+        near = line_id in values if labels else None
+        if LABEL_PROXIMITY == "require" and near is False:
+            continue
+        ranked.append((near is not True, match.get("edits", 0), line_id, match, near))
+    if not ranked:
+        return None
+
+    _, _, line_id, match, near = min(ranked, key=lambda r: r[:3])
+    line = index["lines"][line_id]
+    return {
+        **match,
+        "line": line_id,
+        "lineText": line["text"],
+        "bbox": list(line["bbox"]) if line["bbox"] else None,
+        "nearLabel": near,
+    }
+
+
+def find_date(
+    index: dict, year_month: tuple[int, int], field: str | None = None
+) -> dict | None:
+    """
+    Best line printing the given (year, month) in any supported format
+    ('JUL/2027', '07/2027', '2027-07', ...), ranked like find(). Dates are
+    extracted once per line and kept in the index. The bare "MM-YY" form is
+    only read on lines carrying one of the field's labels ("VTO 07-27"), so
+    lots and prices ("L 12-25", "10.50") are not taken for dates.
+    """
+    if "dates" not in index:
+        index["dates"] = [extract_dates(line["text"]) for line in index["lines"]]
+    labelled = {line_id for line_id, _ in _label_boxes(index, field)}
+
+    matches = []
+    for line_id, line in enumerate(index["lines"]):
+        line_dates = (
+            extract_dates(line["text"], short=True)
+            if line_id in labelled
+            else index["dates"][line_id]
+        )
+        for found in line_dates:
+            if (found["year"], found["month"]) == tuple(year_month):
+                match = {
+                    "start": found["start"],
+                    "end": found["end"],
+                    "edits": 0,
+                    "score": 1.0,
+                    "text": found["text"],
+                    "surface": "line",
+                    "method": "date",
+                    "normalized": normalise(found["year"], found["month"]),
+                }
+                matches.append((line_id, match))
+                break
+    return _pick(index, matches, field) if matches else None
@@ -0,0 +1,70 @@
+import os
+
+import cv2
+import numpy as np
+
+# OCR upload preparation (Function App settings):
+# - OCR_UPLOAD_FORMAT: "jpeg" / "webp" re-encode, "png", or "original" to send
+#   the stored bytes unchanged
+# - OCR_MAX_SIDE: longest side (px) sent to the service, 0 = no downscale
+# - OCR_MIN_TEXT_PX / OCR_SOURCE_TEXT_PX: the service needs text at least
+#   OCR_MIN_TEXT_PX tall; OCR_SOURCE_TEXT_PX is the smallest text height we
+#   expect at working resolution, so the downscale never goes below
+#   OCR_MIN_TEXT_PX / OCR_SOURCE_TEXT_PX
+OCR_UPLOAD_FORMAT = os.getenv("OCR_UPLOAD_FORMAT", "jpeg").strip().lower()
+OCR_UPLOAD_QUALITY = int(os.getenv("OCR_UPLOAD_QUALITY", "90"))
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "0"))
+OCR_MIN_TEXT_PX = float(os.getenv("OCR_MIN_TEXT_PX", "12"))
+OCR_SOURCE_TEXT_PX = float(os.getenv("OCR_SOURCE_TEXT_PX", "24"))
+
+# Image Analysis 4.0 limits
+_MIN_SIDE = 50
+_MAX_SIDE = 16000
+
+_ENCODERS = {
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+    "png": (".png", None),
+}
+
+
+def ocr_scale(width: int, height: int) -> float:
+    """
+    Factor (sent / working) applied before OCR. Honours OCR_MAX_SIDE but never
+    shrinks the smallest expected text below OCR_MIN_TEXT_PX nor a side below
+    the service minimum; also shrinks images above the service maximum.
+    """
+    longest, shortest = max(width, height), min(width, height)
+    scale = 1.0
+    if OCR_MAX_SIDE > 0 and longest > OCR_MAX_SIDE:
+        scale = OCR_MAX_SIDE / longest
+    if OCR_SOURCE_TEXT_PX > 0:
+        scale = max(scale, OCR_MIN_TEXT_PX / OCR_SOURCE_TEXT_PX)
+    scale = max(scale, _MIN_SIDE / shortest) if shortest else scale
+    scale = min(scale, 1.0, _MAX_SIDE / longest)
+    return scale
+
+
+def prepare_ocr_image(img: np.ndarray, raw: bytes | None = None) -> tuple[bytes, float]:
+    """
+    Returns (bytes to upload, scale) for a decoded working image.
+    raw (the stored image file) is sent as-is when OCR_UPLOAD_FORMAT is
+    "original" and no downscale is needed. Polygons in the OCR response are
+    at the sent resolution; divide by scale to map them back.
+    """
+    h, w = img.shape[:2]
+    scale = ocr_scale(w, h)
+    if scale < 1.0:
+        size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+        img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+        # Exact factor per axis differs by rounding only; use the width ratio
+        scale = size[0] / w
+    elif OCR_UPLOAD_FORMAT == "original" and raw is not None:
+        return raw, 1.0
+
+    ext, quality_flag = _ENCODERS.get(OCR_UPLOAD_FORMAT, _ENCODERS["png"])
+    params = [] if quality_flag is None else [int(quality_flag), OCR_UPLOAD_QUALITY]
+    ok, buf = cv2.imencode(ext, img, params)
+    if not ok:
+        raise RuntimeError(f"Failed to encode OCR upload as {ext}")
+    return buf.tobytes(), scale
@@ -0,0 +1,43 @@
+import os
+
+# Settings that decide which activities an orchestration calls. Orchestrator
+# code is replayed, so it must not read them from the environment: a setting
+# changed while instances are in flight would send replays down another path
+# (non-determinism errors). http_start / http_start_batch resolve them once
+# and they travel in the orchestration input as "settings".
+#
+# PIPELINE_ENHANCE_MODE:     "chained": enhance_focus -> adjust_contrast_brightness
+#                            -> to_grayscale; "fused": single enhance_image
+#                            activity (same output, one download/encode);
+#                            "luminance": enhance_image on the grayscale plane
+#                            only (no color intermediates)
+# INGEST_MAX_SIDE:           longest side of the working image (normalize_input);
+#                            0 disables the stage
+# PIPELINE_ADAPTIVE_ROUTING: run assess_quality first and skip the enhancement
+#                            stages it deems unnecessary
+# PIPELINE_ROI_TEMPLATES:    crop barcode/OCR input to the regions learned from
+#                            past runs of the product
+# PIPELINE_OCR_MODE:         "always": barcode and OCR in parallel; "skip": for
+#                            products whose past runs carried GS1 codes
+#                            (lookup_gs1_product), barcode first and OCR only if
+#                            GS1 content does not settle every field; "defer":
+#                            like "skip", but OCR starts together with the
+#                            barcode and the barcode-only result is published
+#                            (custom status) and persisted without waiting for
+#                            it, to keep the OCR record. Other products keep
+#                            barcode and OCR in parallel in every mode.
+
+
+def _flag(name: str) -> bool:
+    return os.getenv(name, "false").strip().lower() == "true"
+
+
+def resolve() -> dict:
+    """Current values of the orchestration settings (called by the starters)."""
+    return {
+        "enhanceMode": os.getenv("PIPELINE_ENHANCE_MODE", "chained").strip().lower(),
+        "ingestMaxSide": int(os.getenv("INGEST_MAX_SIDE", "4096")),
+        "adaptiveRouting": _flag("PIPELINE_ADAPTIVE_ROUTING"),
+        "roiTemplates": _flag("PIPELINE_ROI_TEMPLATES"),
+        "ocrMode": os.getenv("PIPELINE_OCR_MODE", "always").strip().lower(),
+    }
@@ -0,0 +1,153 @@
+import os
+
+from shared_code import dates, ocr_index
+
+# Per-product ROI templates. Packaging layouts are fixed per prodCode, so the
+# text lines and barcode of past successful runs tell us where to look.
+# Regions are stored relative to the image size ([x0, y0, x1, y1] in 0..1)
+# so they apply at any working resolution. Only full-frame runs teach a
+# region: a run that read a crop only saw what was inside it, and learning
+# from it would narrow the template over time. A crop that misses an
+# expected field (or barcode) falls back to the full frame.
+ROI_TEMPLATE_RUNS = int(os.getenv("ROI_TEMPLATE_RUNS", "20"))
+ROI_TEMPLATE_MIN_RUNS = int(os.getenv("ROI_TEMPLATE_MIN_RUNS", "3"))
+ROI_TEMPLATE_MARGIN = float(os.getenv("ROI_TEMPLATE_MARGIN", "0.05"))
+
+# Expected values equal to the sentinel are not looked for (see validation)
+_SENTINEL = os.getenv("SENTINEL_SKIP_VALIDATION", "N/A").strip().upper()
+
+
+def _union(boxes: list[list[float]]) -> list[float] | None:
+    if not boxes:
+        return None
+    return [
+        min(b[0] for b in boxes),
+        min(b[1] for b in boxes),
+        max(b[2] for b in boxes),
+        max(b[3] for b in boxes),
+    ]
+
+
+def _expand(box: list[float] | None, margin: float) -> list[float] | None:
+    """Grows a relative box by `margin` (fraction of the image) on every side."""
+    if box is None:
+        return None
+    return [
+        round(max(0.0, box[0] - margin), 4),
+        round(max(0.0, box[1] - margin), 4),
+        round(min(1.0, box[2] + margin), 4),
+        round(min(1.0, box[3] + margin), 4),
+    ]
+
+
+def text_region(ocr_payload: dict) -> list[float] | None:
+    """Relative box enclosing every OCR line polygon of one run."""
+    metadata = (ocr_payload or {}).get("metadata") or {}
+    width, height = metadata.get("width"), metadata.get("height")
+    if not width or not height:
+        return None
+    xs, ys = [], []
+    for block in ((ocr_payload.get("readResult") or {}).get("blocks")) or []:
+        for line in block.get("lines") or []:
+            for p in line.get("boundingPolygon") or []:
+                if isinstance(p, dict) and "x" in p and "y" in p:
+                    xs.append(p["x"])
+                    ys.append(p["y"])
+    if not xs:
+        return None
+    return [min(xs) / width, min(ys) / height, max(xs) / width, max(ys) / height]
+
+
+def barcode_region(
+    barcode_boxes: list | None, width: int | None, height: int | None
+) -> list[float] | None:
+    """
+    Relative box enclosing every barcodeBox of one run ([x, y, w, h] at
+    working size), so a crop to it holds all the codes the run decoded.
+    """
+    if not width or not height:
+        return None
+    boxes = [
+        [x / width, y / height, (x + w) / width, (y + h) / height]
+        for x, y, w, h in (b for b in barcode_boxes or [] if b)
+    ]
+    return _union(boxes)
+
+
+def learn_template(text_runs: list[dict], barcode_runs: list[dict]) -> dict | None:
+    """
+    text_runs: OCR payloads ({"metadata", "readResult"}) and barcode_runs:
+    [{"barcodeBoxes": [[x,y,w,h], ...], "width", "height"}, ...] of the last
+    successful full-frame runs of one product (runs that only read a
+    template crop are filtered out by the query). Box coordinates share the
+    working resolution (width/height from the OCR metadata).
+    Returns {"text": box|None, "barcode": box|None, "barcodeCount": n|None,
+    "runs": n} or None if neither region has ROI_TEMPLATE_MIN_RUNS usable
+    runs. The barcode region is the union of every decoded code, and
+    barcodeCount the fewest codes a run decoded: a crop decoding fewer
+    missed one.
+    """
+    text_boxes = [b for b in map(text_region, text_runs) if b is not None]
+    barcode_boxes, barcode_counts = [], []
+    for run in barcode_runs:
+        box = barcode_region(
+            run.get("barcodeBoxes"), run.get("width"), run.get("height")
+        )
+        if box is not None:
+            barcode_boxes.append(box)
+            barcode_counts.append(sum(1 for b in run["barcodeBoxes"] if b))
+
+    if max(len(text_boxes), len(barcode_boxes)) < ROI_TEMPLATE_MIN_RUNS:
+        return None
+    barcode_ok = len(barcode_boxes) >= ROI_TEMPLATE_MIN_RUNS
+    return {
+        "text": (
+            _expand(_union(text_boxes), ROI_TEMPLATE_MARGIN)
+            if len(text_boxes) >= ROI_TEMPLATE_MIN_RUNS
+            else None
+        ),
+        "barcode": (
+            _expand(_union(barcode_boxes), ROI_TEMPLATE_MARGIN) if barcode_ok else None
+        ),
+        "barcodeCount": min(barcode_counts) if barcode_ok else None,
+        "runs": max(len(text_runs), len(barcode_runs)),
+    }
+
+
+def missing_fields(ocr_data: dict, expected_data: dict | None) -> list[str]:
+    """
+    Expected fields (lot, expDate, packDate) not read in an OCR result, as
+    validate_extracted_data looks them up (line by line, dates also as
+    month/year). An OCR result without lines misses everything ("text").
+    """
+    index = ocr_index.build_index(ocr_data)
+    if not index["lines"]:
+        return ["text"]
+    missing = []
+    for field in ocr_index.FIELD_LABELS:
+        value = ((expected_data or {}).get(field) or "").strip()
+        if not value or value.upper() == _SENTINEL:
+            continue
+        if ocr_index.find(index, value, field) is not None:
+            continue
+        wanted = dates.parse_month_year(value) if field != "lot" else None
+        if wanted and ocr_index.find_date(index, wanted, field) is not None:
+            continue
+        missing.append(field)
+    return missing
+
+
+def pixel_region(roi: list[float] | None, width: int, height: int) -> list | None:
+    """
+    Relative template box -> [x, y, w, h] in pixels, clamped to the image.
+    Returns None when there is no template or it covers the whole frame.
+    """
+    if not roi:
+        return None
+    x0 = max(0, min(width - 1, int(roi[0] * width)))
+    y0 = max(0, min(height - 1, int(roi[1] * height)))
+    x1 = max(x0 + 1, min(width, int(round(roi[2] * width))))
+    y1 = max(y0 + 1, min(height, int(round(roi[3] * height))))
+    if (x0, y0, x1, y1) == (0, 0, width, height):
+        return None
+    return [x0, y0, x1 - x0, y1 - y0]
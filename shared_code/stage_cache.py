@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from typing import Callable
+
+import numpy as np
+
+from shared_code.image_codec import extension_for, policy_for
+from shared_code.storage_util import (
+    download_bytes,
+    get_properties,
+    upload_image,
+)
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed cache for the enhancement stages. Outputs in 'work' are
+# named after a hash of (stage, parameters, work codec, input content)
+# instead of a uuid, so re-submitting the same upload reuses the previous
+# result. Hits and misses are counted per stage since the worker started
+# and logged with every lookup; each run's totals are persisted
+# (enhance_cache_hits / enhance_cache_lookups in vision_pipeline_log).
+CACHE_ENABLED = os.getenv("ENHANCE_CACHE_ENABLED", "true").strip().lower() == "true"
+
+# Bump when a stage algorithm changes so stale outputs are not reused
+_CACHE_VERSION = 1
+
+_stats: dict[str, dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def content_digest(container: str, blob_name: str) -> tuple[str, bytes | None]:
+    """
+    Returns (digest, raw). The digest comes from blob properties when possible
+    ('sha256' metadata written by upload_image, or the service Content-MD5),
+    in which case raw is None. Otherwise the blob is downloaded and hashed,
+    and its bytes are returned so the caller does not download it twice.
+    """
+    props = get_properties(container, blob_name)
+    if props is not None:
+        sha256 = (props.metadata or {}).get("sha256")
+        if sha256:
+            return f"sha256:{sha256}", None
+        md5 = props.content_settings.content_md5
+        if md5:
+            return f"md5:{bytes(md5).hex()}", None
+
+    raw = download_bytes(container, blob_name)
+    return f"sha256:{hashlib.sha256(raw).hexdigest()}", raw
+
+
+def cache_key(stage: str, params: dict, digest: str) -> str:
+    """Deterministic key for a stage output (work codec settings included)."""
+    material = json.dumps(
+        {
+            "v": _CACHE_VERSION,
+            "stage": stage,
+            "params": params,
+            "codec": policy_for("work"),
+            "input": digest,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _record(stage: str, hit: bool) -> None:
+    with _stats_lock:
+        s = _stats.setdefault(stage, {"hits": 0, "misses": 0})
+        s["hits" if hit else "misses"] += 1
+
+
+def cache_stats() -> dict:
+    """Hits, misses and hit rate per stage since the worker started."""
+    with _stats_lock:
+        return {
+            stage: {
+                **s,
+                "hitRate": round(s["hits"] / (s["hits"] + s["misses"]), 3),
+            }
+            for stage, s in _stats.items()
+        }
+
+
+def run_cached_stage(
+    ref: dict,
+    stage: str,
+    params: dict,
+    transform: Callable[[bytes], np.ndarray],
+) -> dict:
+    """
+    Runs an enhancement stage whose output goes to work/<stage>/.
+    transform: raw input bytes -> output image.
+    On a cache hit the existing blob is returned without downloading or
+    decoding the input.
+    Output: {"container": "work", "blobName": "<stage>/<key>.<ext>", "cacheHit": bool}
+    """
+    if not CACHE_ENABLED:
+        raw = download_bytes(ref["container"], ref["blobName"])
+        out_name = upload_image("work", f"{stage}/{uuid.uuid4()}", transform(raw))
+        return {"container": "work", "blobName": out_name, "cacheHit": False}
+
+    digest, raw = content_digest(ref["container"], ref["blobName"])
+    key = cache_key(stage, params, digest)
+    out_stem = f"{stage}/{key}"
+    cached_name = f"{out_stem}{extension_for('work')}"
+
+    if get_properties("work", cached_name) is not None:
+        _record(stage, True)
+        logger.info(
+            "cache hit stage=%s blob=%s stats=%s", stage, cached_name, cache_stats()
+        )
+        return {"container": "work", "blobName": cached_name, "cacheHit": True}
+
+    _record(stage, False)
+    logger.info("cache miss stage=%s key=%s stats=%s", stage, key, cache_stats())
+    if raw is None:
+        raw = download_bytes(ref["container"], ref["blobName"])
+    out_name = upload_image("work", out_stem, transform(raw))
+    return {"container": "work", "blobName": out_name, "cacheHit": False}
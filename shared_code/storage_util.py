@@ -1,6 +1,21 @@
+import asyncio
+import hashlib
 import os
+import time
+from collections.abc import Awaitable
 
-from azure.storage.blob import BlobServiceClient, ContentSettings
+import cv2
+import numpy as np
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import BlobProperties, BlobServiceClient, ContentSettings
+from azure.storage.blob.aio import BlobServiceClient as AsyncBlobServiceClient
+
+from shared_code.image_codec import (
+    decode_image,
+    encode_image,
+    format_of_blob,
+    policy_for,
+)
 
 # Reads credentials from app settings (Function App)
 ACCOUNT_URL = os.environ[
@@ -11,6 +26,17 @@ ACCOUNT_KEY = os.environ["BLOB_ACCOUNT_KEY"]
 # Reusable single client (internal connections are pooled)
 _bsc = BlobServiceClient(account_url=ACCOUNT_URL, credential=ACCOUNT_KEY)
 
+# Async client for async activities; created on first use so it binds to the
+# worker's running event loop
+_abs: AsyncBlobServiceClient | None = None
+
+
+def _async_client() -> AsyncBlobServiceClient:
+    global _abs
+    if _abs is None:
+        _abs = AsyncBlobServiceClient(account_url=ACCOUNT_URL, credential=ACCOUNT_KEY)
+    return _abs
+
 
 def download_bytes(container: str, blob_name: str) -> bytes:
     """
@@ -24,11 +50,24 @@ def download_bytes(container: str, blob_name: str) -> bytes:
     )
 
 
+def download_range(container: str, blob_name: str, length: int) -> bytes:
+    """
+    Downloads only the first `length` bytes of a blob (e.g. image headers).
+    """
+    return (
+        _bsc.get_container_client(container)
+        .get_blob_client(blob_name)
+        .download_blob(offset=0, length=length)
+        .readall()
+    )
+
+
 def upload_bytes(
     container: str,
     blob_name: str,
     data: bytes,
     content_type: str = "application/octet-stream",
+    metadata: dict | None = None,
 ) -> None:
     """
     Uploads bytes to the blob (overwrite=True) and sets the Content-Type.
@@ -40,5 +79,154 @@ def upload_bytes(
             data,
             overwrite=True,
             content_settings=ContentSettings(content_type=content_type),
+            metadata=metadata,
         )
     )
+
+
+def get_properties(container: str, blob_name: str) -> BlobProperties | None:
+    """
+    Returns the blob properties (metadata, Content-MD5, size...) without
+    downloading the content, or None if the blob does not exist.
+    """
+    try:
+        return (
+            _bsc.get_container_client(container)
+            .get_blob_client(blob_name)
+            .get_blob_properties()
+        )
+    except ResourceNotFoundError:
+        return None
+
+
+def delete_blob(container: str, blob_name: str) -> None:
+    """Deletes a blob; a blob that is already gone is not an error."""
+    try:
+        _bsc.get_container_client(container).get_blob_client(blob_name).delete_blob()
+    except ResourceNotFoundError:
+        pass
+
+
+def list_blobs(container: str, prefix: str) -> list[BlobProperties]:
+    """Properties (name, size, last_modified...) of the blobs under a prefix."""
+    return list(
+        _bsc.get_container_client(container).list_blobs(name_starts_with=prefix)
+    )
+
+
+def download_image(
+    container: str, blob_name: str, flags: int = cv2.IMREAD_COLOR
+) -> np.ndarray | None:
+    """
+    Downloads and decodes an image blob (PNG/JPEG/WebP or .npy intermediate).
+    Returns None if the blob cannot be decoded.
+    """
+    return decode_image(download_bytes(container, blob_name), flags)
+
+
+def upload_image(container: str, blob_stem: str, img: np.ndarray) -> str:
+    """
+    Encodes the image with the container codec policy, uploads it and
+    returns the final blob name (blob_stem + policy extension).
+    The SHA-256 of the encoded bytes is stored as 'sha256' metadata so later
+    stages can key on the content without downloading it.
+    """
+    data, ext, content_type = encode_image(img, container)
+    blob_name = f"{blob_stem}{ext}"
+    metadata = {"sha256": hashlib.sha256(data).hexdigest()}
+    upload_bytes(container, blob_name, data, content_type, metadata)
+    return blob_name
+
+
+# ---- Async variants (azure.storage.blob.aio, used by async activities) ----
+
+
+async def download_bytes_async(container: str, blob_name: str) -> bytes:
+    """Async download_bytes()."""
+    blob = _async_client().get_container_client(container).get_blob_client(blob_name)
+    stream = await blob.download_blob()
+    return await stream.readall()
+
+
+async def upload_bytes_async(
+    container: str,
+    blob_name: str,
+    data: bytes,
+    content_type: str = "application/octet-stream",
+    metadata: dict | None = None,
+) -> None:
+    """Async upload_bytes()."""
+    blob = _async_client().get_container_client(container).get_blob_client(blob_name)
+    await blob.upload_blob(
+        data,
+        overwrite=True,
+        content_settings=ContentSettings(content_type=content_type),
+        metadata=metadata,
+    )
+
+
+async def upload_image_async(container: str, blob_stem: str, img: np.ndarray) -> str:
+    """Async upload_image(); encoding runs on a worker thread."""
+    data, ext, content_type = await asyncio.to_thread(encode_image, img, container)
+    blob_name = f"{blob_stem}{ext}"
+    metadata = {"sha256": hashlib.sha256(data).hexdigest()}
+    await upload_bytes_async(container, blob_name, data, content_type, metadata)
+    return blob_name
+
+
+async def copy_blob_async(
+    src_container: str,
+    src_blob: str,
+    dst_container: str,
+    dst_blob: str,
+    timeout: float = 60.0,
+    poll: float = 0.25,
+) -> None:
+    """
+    Server-side copy (Copy Blob from URL) within the storage account, awaited
+    without blocking the loop; returns once the destination blob is complete.
+    Raises RuntimeError if the copy failed/was aborted and TimeoutError on timeout.
+    """
+    client = _async_client()
+    src_url = client.get_container_client(src_container).get_blob_client(src_blob).url
+    dst = client.get_container_client(dst_container).get_blob_client(dst_blob)
+    await dst.start_copy_from_url(src_url)
+
+    deadline = time.monotonic() + timeout
+    while True:
+        copy = (await dst.get_blob_properties()).copy
+        if copy.status != "pending":
+            break
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Copy to {dst_container}/{dst_blob} still pending")
+        await asyncio.sleep(poll)
+    if copy.status != "success":
+        raise RuntimeError(
+            f"Copy to {dst_container}/{dst_blob} {copy.status}: "
+            f"{copy.status_description}"
+        )
+
+
+async def copy_image_async(
+    src_container: str,
+    src_blob: str,
+    dst_container: str,
+    dst_blob: str,
+    raw: Awaitable[bytes] | None = None,
+) -> None:
+    """
+    Stores an image blob as dst_blob, which must carry the extension of the
+    destination container codec. If the source already uses that codec it is
+    a server-side copy (no bytes through the worker); otherwise (e.g. a .npy
+    intermediate) the image is downloaded, or taken from `raw` when the
+    caller is already downloading it, and re-encoded.
+    """
+    if format_of_blob(src_blob) == policy_for(dst_container)["format"]:
+        await copy_blob_async(src_container, src_blob, dst_container, dst_blob)
+        return
+
+    data = await (raw or download_bytes_async(src_container, src_blob))
+    img = await asyncio.to_thread(decode_image, data, cv2.IMREAD_UNCHANGED)
+    if img is None:
+        raise RuntimeError(f"Could not decode image {src_container}/{src_blob}")
+    await upload_image_async(dst_container, os.path.splitext(dst_blob)[0], img)
@@ -0,0 +1,191 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+# Tiled (strip-wise) execution of the enhancement transforms for very large
+# images. Only uint8 full-resolution planes are kept; float32/LAB data lives
+# in per-strip buffers whose size is bounded by a memory budget. Strips carry
+# the halo each operation needs, so results match the full-frame functions
+# (CLAHE up to +-1 on a few pixels from float rounding of tile coordinates).
+TILED_MIN_MEGAPIXELS = float(os.getenv("ENHANCE_TILED_MIN_MP", "24"))
+TILE_MEMORY_MB = int(os.getenv("ENHANCE_TILE_MEMORY_MB", "256"))
+TILE_WORKERS = int(os.getenv("ENHANCE_TILE_WORKERS", str(os.cpu_count() or 2)))
+
+# Worst-case bytes per pixel of a strip in flight (LAB strip + float32 copy,
+# blurred and sharpened planes + Laplacian in float64).
+_STRIP_BYTES_PER_PX = 32
+
+# Bytes per pixel of a CLAHE band in flight (padded copy + uint8 output)
+_CLAHE_BYTES_PER_PX = 3
+
+_pool = ThreadPoolExecutor(max_workers=max(1, TILE_WORKERS))
+
+
+def should_tile(img: np.ndarray) -> bool:
+    """True if the image is large enough to use the tiled path."""
+    if TILED_MIN_MEGAPIXELS <= 0:
+        return False
+    return img.shape[0] * img.shape[1] >= TILED_MIN_MEGAPIXELS * 1_000_000
+
+
+def strip_rows(cols: int) -> int:
+    """Rows per strip so that all workers together stay within the budget."""
+    budget = TILE_MEMORY_MB * 1024 * 1024
+    per_worker = budget // max(1, TILE_WORKERS)
+    return max(32, per_worker // (cols * _STRIP_BYTES_PER_PX))
+
+
+def _strips(rows: int, step: int) -> list[tuple[int, int]]:
+    return [(y, min(y + step, rows)) for y in range(0, rows, step)]
+
+
+def _run(fn, bounds: list[tuple[int, int]], workers: int | None = None) -> list:
+    """
+    Runs fn(y0, y1) for every strip on the thread pool (OpenCV releases the
+    GIL), at most `workers` strips at a time (default: the whole pool).
+    """
+    if workers is None or workers >= TILE_WORKERS:
+        return list(_pool.map(lambda b: fn(*b), bounds))
+    out = []
+    for i in range(0, len(bounds), workers):
+        out.extend(_pool.map(lambda b: fn(*b), bounds[i : i + workers]))
+    return out
+
+
+def gaussian_radius(sigma: float) -> int:
+    """Kernel radius used by cv2.GaussianBlur(..., (0, 0), sigma) on float32."""
+    return int(round(sigma * 4 * 2 + 1)) // 2
+
+
+def for_each_strip(rows: int, cols: int, fn) -> None:
+    """Calls fn(y0, y1) for budget-sized row strips on the thread pool."""
+    _run(fn, _strips(rows, strip_rows(cols)))
+
+
+def laplacian_variance(img: np.ndarray) -> float:
+    """
+    Variance of the Laplacian of the grayscale image (BGR or gray input),
+    computed per strip (1-row halo) and merged with the parallel variance formula.
+    """
+    rows = img.shape[0]
+
+    def _stats(y0, y1):
+        h0, h1 = max(0, y0 - 1), min(rows, y1 + 1)
+        gray = img[h0:h1]
+        if gray.ndim == 3:
+            gray = cv2.cvtColor(gray, cv2.COLOR_BGR2GRAY)
+        lap = cv2.Laplacian(gray, cv2.CV_64F)[y0 - h0 : y0 - h0 + (y1 - y0)]
+        return lap.size, float(lap.mean()), float(lap.var()) * lap.size
+
+    n, mean, m2 = 0, 0.0, 0.0
+    for nb, mean_b, m2_b in _run(_stats, _strips(rows, strip_rows(img.shape[1]))):
+        delta = mean_b - mean
+        total = n + nb
+        mean += delta * nb / total
+        m2 += m2_b + delta * delta * n * nb / total
+        n = total
+    return m2 / n if n else 0.0
+
+
+def lightness(bgr: np.ndarray) -> np.ndarray:
+    """L channel of LAB as a uint8 plane, converting one strip at a time."""
+    rows, cols = bgr.shape[:2]
+    out = np.empty((rows, cols), np.uint8)
+
+    def _l(y0, y1):
+        out[y0:y1] = cv2.cvtColor(bgr[y0:y1], cv2.COLOR_BGR2LAB)[..., 0]
+
+    _run(_l, _strips(rows, strip_rows(cols)))
+    return out
+
+
+def replace_lightness(bgr: np.ndarray, l_plane: np.ndarray) -> np.ndarray:
+    """
+    Writes l_plane as the L channel of bgr IN PLACE (A/B are recomputed per
+    strip instead of being stored at full resolution). Returns bgr.
+    """
+    rows, cols = bgr.shape[:2]
+
+    def _merge(y0, y1):
+        lab = cv2.cvtColor(bgr[y0:y1], cv2.COLOR_BGR2LAB)
+        lab[..., 0] = l_plane[y0:y1]
+        bgr[y0:y1] = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+
+    _run(_merge, _strips(rows, strip_rows(cols)))
+    return bgr
+
+
+def unsharp(
+    plane: np.ndarray, amount: float, sigma: float, saturate: bool = False
+) -> np.ndarray:
+    """
+    Unsharp Mask on a uint8 plane, one float32 strip at a time with a halo
+    of one Gaussian radius. saturate=False clips+truncates like the color path;
+    saturate=True rounds like enhance_luminance.
+    """
+    rows, cols = plane.shape
+    out = np.empty_like(plane)
+    halo = gaussian_radius(sigma)
+
+    def _sharpen(y0, y1):
+        h0, h1 = max(0, y0 - halo), min(rows, y1 + halo)
+        src = plane[h0:h1].astype(np.float32)
+        blurred = cv2.GaussianBlur(src, (0, 0), sigma)
+        if saturate:
+            sharp = cv2.addWeighted(
+                src, 1.0 + amount, blurred, -amount, 0, dtype=cv2.CV_8U
+            )
+        else:
+            sharp = cv2.addWeighted(src, 1.0 + amount, blurred, -amount, 0)
+            sharp = np.clip(sharp, 0, 255).astype(np.uint8)
+        out[y0:y1] = sharp[y0 - h0 : y0 - h0 + (y1 - y0)]
+
+    _run(_sharpen, _strips(rows, strip_rows(cols)))
+    return out
+
+
+def clahe(
+    src: np.ndarray, dst: np.ndarray, clip_limit: float, tile_size: int
+) -> np.ndarray:
+    """
+    CLAHE on a uint8 plane equivalent to
+    cv2.createCLAHE(clip_limit, (tile_size, tile_size)).apply(src).
+    Strips are aligned to CLAHE tile rows and carry one tile row of halo on
+    each side, so histograms and the bilinear interpolation between tiles
+    are the same as on the full frame. dst may not alias src.
+    Bands are sized from each worker's share of the memory budget; when even
+    a one-tile-row band (three with its halo) exceeds the share, fewer bands
+    run at once so that the bands in flight stay within the budget.
+    """
+    rows, cols = src.shape
+    # Same bottom/right reflect-101 padding OpenCV applies when the image is
+    # not divisible by the tile grid (it pads both axes in that case)
+    pad_b = pad_r = 0
+    if rows % tile_size or cols % tile_size:
+        pad_b = tile_size - rows % tile_size
+        pad_r = tile_size - cols % tile_size
+    tile_h = (rows + pad_b) // tile_size
+    budget = TILE_MEMORY_MB * 1024 * 1024
+    row_bytes = tile_h * (cols + pad_r) * _CLAHE_BYTES_PER_PX
+    band = max(1, budget // max(1, TILE_WORKERS) // row_bytes - 2)
+    workers = max(1, min(TILE_WORKERS, budget // ((band + 2) * row_bytes)))
+
+    def _band(t0, t1):
+        h0, h1 = max(0, t0 - 1), min(tile_size, t1 + 1)
+        y0, y1 = h0 * tile_h, min(h1 * tile_h, rows)
+        strip = src[y0:y1]
+        bottom = pad_b if h1 == tile_size else 0
+        if bottom or pad_r:
+            strip = cv2.copyMakeBorder(
+                strip, 0, bottom, 0, pad_r, cv2.BORDER_REFLECT_101
+            )
+        out = cv2.createCLAHE(
+            clipLimit=clip_limit, tileGridSize=(tile_size, h1 - h0)
+        ).apply(strip)
+        k0, k1 = t0 * tile_h, min(t1 * tile_h, rows)
+        dst[k0:k1] = out[k0 - y0 : k1 - y0, :cols]
+
+    _run(_band, _strips(tile_size, band), workers)
+    return dst
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+# Settings read at import time by shared_code (storage_util, ocr_client).
+# No test talks to Azure: the storage and HTTP calls are monkeypatched.
+os.environ.setdefault(
+    "BLOB_ACCOUNT_URL", "https://devstoreaccount1.blob.core.windows.net"
+)
+os.environ.setdefault("BLOB_ACCOUNT_KEY", "ZGV2c3RvcmVrZXk=")
+os.environ.setdefault("AZURE_OCR_ENDPOINT", "https://ocr.example.invalid")
+os.environ.setdefault("AZURE_OCR_KEY", "test-key")
+
+
+def _ocr_result(*lines: str) -> dict:
+    """OCR result with one line per text, stacked 50 px apart."""
+    return {
+        "readResult": {
+            "blocks": [
+                {
+                    "lines": [
+                        {
+                            "text": text,
+                            "boundingPolygon": [
+                                {"x": 0, "y": 50 * i},
+                                {"x": 300, "y": 50 * i},
+                                {"x": 300, "y": 50 * i + 40},
+                                {"x": 0, "y": 50 * i + 40},
+                            ],
+                        }
+                        for i, text in enumerate(lines)
+                    ]
+                }
+            ]
+        }
+    }
+
+
+@pytest.fixture
+def ocr_result():
+    """Builds an OCR result from line texts (see _ocr_result)."""
+    return _ocr_result
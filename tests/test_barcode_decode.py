@@ -0,0 +1,87 @@
+import numpy as np
+import zxingcpp
+
+from shared_code import barcode_decode
+
+EAN = "4006381333931"
+
+
+def _ean13(text: str = EAN) -> np.ndarray:
+    return np.array(
+        zxingcpp.write_barcode(
+            zxingcpp.BarcodeFormat.EAN13, text, width=300, height=120
+        )
+    )
+
+
+def _canvas(*placed: tuple[np.ndarray, int, int]) -> np.ndarray:
+    canvas = np.full((1500, 2000), 255, np.uint8)
+    for code, x, y in placed:
+        canvas[y : y + code.shape[0], x : x + code.shape[1]] = code
+    return canvas
+
+
+def _decoded(hits: list) -> list[str]:
+    return sorted(r.text for r, _, _ in hits)
+
+
+def test_locate_finds_each_code():
+    code = _ean13()
+    gray = _canvas((code, 1200, 700), (code, 100, 100))
+    boxes = barcode_decode.locate_candidates(gray)
+    assert len(boxes) == 2
+    for x, y, w, h in boxes:
+        assert (x <= 100 or x <= 1200 <= x + w) and w >= code.shape[1]
+
+
+def test_located_tier_maps_hits_to_the_input(monkeypatch):
+    monkeypatch.setattr(barcode_decode, "BARCODE_LOCATE", True)
+    gray = _canvas((_ean13(), 1200, 700), (_ean13("9501101530003"), 100, 100))
+    hits, tier, log = barcode_decode.decode_tiered(
+        gray, barcode_decode.formats_for(None)
+    )
+    assert tier == "located" and [t["tier"] for t in log] == ["located"]
+    assert _decoded(hits) == [EAN, "9501101530003"]
+    for r, factor, (dx, dy) in hits:
+        x = r.position.top_left.x / factor + dx
+        assert abs(x - (1200 if r.text == EAN else 100)) < 40
+
+
+def test_escalates_to_harder_for_inverted_codes(monkeypatch):
+    monkeypatch.setattr(barcode_decode, "BARCODE_LOCATE", False)
+    gray = 255 - _canvas((_ean13(), 800, 600))
+    hits, tier, log = barcode_decode.decode_tiered(
+        gray, barcode_decode.formats_for(None)
+    )
+    assert _decoded(hits) == [EAN]
+    assert tier == "harder"
+    assert [t["tier"] for t in log] == ["fast", "full", "harder"]
+
+
+def test_nothing_found_tries_every_tier(monkeypatch):
+    monkeypatch.setattr(barcode_decode, "BARCODE_LOCATE", True)
+    hits, tier, log = barcode_decode.decode_tiered(np.full((400, 400), 255, np.uint8))
+    assert (hits, tier) == ([], None)
+    assert [t["tier"] for t in log] == list(barcode_decode.TIERS)
+
+
+def test_repeated_reads_are_dropped():
+    code = _ean13()
+    (r,) = zxingcpp.read_barcodes(code)
+    assert len(barcode_decode._unique([(r, 1.0, (0, 0)), (r, 1.0, (5, 5))])) == 1
+
+
+def test_product_formats(monkeypatch):
+    monkeypatch.setattr(
+        barcode_decode, "BARCODE_PRODUCT_FORMATS", {"P": "EAN8", "Q": ""}
+    )
+    assert barcode_decode.formats_for("P") == zxingcpp.barcode_formats_from_str("EAN8")
+    assert barcode_decode.formats_for("Q") is None
+    # Only the last tier reads symbologies outside the product's formats
+    _, tier, _ = barcode_decode.decode_tiered(_ean13(), barcode_decode.formats_for("P"))
+    assert tier == "harder"
+    # An empty spec means every format
+    hits, tier, _ = barcode_decode.decode_tiered(
+        _ean13(), barcode_decode.formats_for("Q")
+    )
+    assert _decoded(hits) == [EAN] and tier != "harder"
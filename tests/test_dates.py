@@ -0,0 +1,63 @@
+import pytest
+
+from shared_code import dates, ocr_index
+
+
+@pytest.fixture
+def find(ocr_result):
+    def _find(field: str, expected: str, *lines: str) -> dict | None:
+        index = ocr_index.build_index(ocr_result(*lines))
+        return ocr_index.find_date(index, dates.parse_month_year(expected), field)
+
+    return _find
+
+
+def test_parses_supported_formats():
+    for text in (
+        "V JUL/2027",
+        "JUL 2027",
+        "JUL 27",
+        "JULIO DE 2027",
+        "2027 JUL",
+        "07/2027",
+        "2027-07",
+        "31/07/2027",
+        "V JUL/2O27",
+    ):
+        assert dates.parse_month_year(text) == (2027, 7), text
+
+
+def test_month_words_are_not_dates():
+    assert dates.extract_dates("JULIO") == []
+    assert dates.extract_dates("MARZO") == []
+    assert dates.extract_dates("JUL27") == []
+
+
+def test_two_digit_years_need_real_digits():
+    assert dates.extract_dates("JUL IO") == []
+    assert dates.extract_dates("JUL 1O", short=True) == []
+
+
+def test_bare_short_form_needs_short():
+    assert dates.extract_dates("L 12-25") == []
+    assert dates.extract_dates("PRECIO 10.50") == []
+    assert dates.extract_dates("07-27", short=True)[0]["year"] == 2027
+
+
+def test_lot_is_not_a_packing_date(find):
+    assert find("packDate", "E DIC/2025", "L 12-25") is None
+
+
+def test_price_is_not_a_packing_date(find):
+    assert find("packDate", "E OCT/2050", "PRECIO 10.50") is None
+
+
+def test_short_form_on_labelled_line(find):
+    match = find("expDate", "V JUL/2027", "L 12-25", "VTO 07-27")
+    assert match["lineText"] == "VTO 07-27"
+    assert match["normalized"] == "2027-07"
+
+
+def test_other_format_matches(find):
+    match = find("expDate", "V JUL/2027", "VENC 07/2027")
+    assert match["text"] == "07/2027"
@@ -0,0 +1,30 @@
+import enhance_image
+from shared_code import stage_cache
+
+
+def _key(monkeypatch, steps: dict | None = None) -> str:
+    captured = {}
+
+    def _fake_stage(ref, stage, params, fn):
+        captured["params"] = params
+        return {}
+
+    monkeypatch.setattr(enhance_image, "run_cached_stage", _fake_stage)
+    enhance_image.main({"container": "work", "blobName": "n.png", "steps": steps})
+    return stage_cache.cache_key("bw", captured["params"], "digest")
+
+
+def test_key_tracks_contrast_parameters(monkeypatch):
+    before = _key(monkeypatch)
+    monkeypatch.setattr(
+        enhance_image,
+        "_CACHE_PARAMS",
+        {**enhance_image._CACHE_PARAMS, "contrast": {"clip": 3.0, "tile": 8}},
+    )
+    assert _key(monkeypatch) != before
+
+
+def test_key_tracks_plan_steps(monkeypatch):
+    full = _key(monkeypatch)
+    assert _key(monkeypatch, {"enhanceFocus": False}) != full
+    assert _key(monkeypatch, {"enhanceFocus": True, "adjustContrast": True}) == full
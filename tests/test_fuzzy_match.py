@@ -0,0 +1,44 @@
+from shared_code import fuzzy_match
+
+
+def test_confusable_characters_cost_nothing():
+    match = fuzzy_match.best_match("LOTE: S1O1I44 VTO", "5101144")
+    assert match["edits"] == 0 and match["text"] == "S1O1I44"
+    assert (match["start"], match["end"]) == (6, 13)
+    assert fuzzy_match.fold("S1O1I44") == fuzzy_match.fold("5101144")
+
+
+def test_default_budget_is_exact(monkeypatch):
+    monkeypatch.setattr(fuzzy_match, "MATCH_MAX_EDITS", 0)
+    assert fuzzy_match.best_match("L 101145", "101144") is None
+
+
+def test_edit_budget_scales_with_length(monkeypatch):
+    monkeypatch.setattr(fuzzy_match, "MATCH_MAX_EDITS", 2)
+    assert fuzzy_match.max_edits(3) == 0  # "S 1": no edits
+    assert fuzzy_match.max_edits(7) == 1
+    assert fuzzy_match.max_edits(40) == 2  # hard cap
+    assert fuzzy_match.best_match("L 1O1145", "101144") is None  # 6 chars
+    assert fuzzy_match.best_match("LOT 12345X78", "123456789") is None  # 1 edit
+    assert fuzzy_match.best_match("LOT 12345X789", "123456789")["edits"] == 1
+    pattern = "ABCDEFGHJKLMNP"  # 14 chars: 2 edits
+    assert fuzzy_match.best_match("ABCDXFGHJKLMNX", pattern)["edits"] == 2
+    assert fuzzy_match.best_match("ABCDXFGHXKLMNX", pattern) is None
+
+
+def test_limit_bounds_and_span():
+    # One substitution
+    match = fuzzy_match.best_match("XX ABCDXFG YY", "ABCDEFG", limit=1)
+    assert match["edits"] == 1 and match["text"] == "ABCDXFG"
+    assert match["score"] == round(1 - 1 / 7, 3)
+    # One deletion in the text and one insertion
+    assert fuzzy_match.best_match("XX ABCEFG", "ABCDEFG", limit=1)["text"] == "ABCEFG"
+    assert fuzzy_match.best_match("ABCDDEFG", "ABCDEFG", limit=1)["edits"] == 1
+    # Two edits are over a limit of one
+    assert fuzzy_match.best_match("ABXDEYG", "ABCDEFG", limit=1) is None
+    assert fuzzy_match.best_match("ABXDEYG", "ABCDEFG", limit=2)["edits"] == 2
+
+
+def test_empty_inputs():
+    assert fuzzy_match.best_match("", "ABC") is None
+    assert fuzzy_match.best_match("ABC", "") is None
@@ -0,0 +1,47 @@
+from shared_code import gs1
+
+GTIN = "09506000134352"
+
+
+def test_parse_human_readable():
+    assert gs1.parse(f"(01){GTIN}(17)270731(10)S101144") == {
+        "01": GTIN,
+        "17": "270731",
+        "10": "S101144",
+    }
+    assert gs1.parse(f"x(01){GTIN}") is None
+
+
+def test_parse_raw_with_group_separator():
+    raw = f"01{GTIN}10S101144{gs1.GS}17270731"
+    assert gs1.parse(raw) == {"01": GTIN, "10": "S101144", "17": "270731"}
+    # The last variable-length field runs to the end of the data
+    assert gs1.parse(f"{gs1.GS}0101234567890128" + "21ABC")["21"] == "ABC"
+
+
+def test_parse_symbology_prefix():
+    assert gs1.parse("]d21712310010L1") == {"17": "123100", "10": "L1"}
+    assert gs1.parse("]d2") is None
+
+
+def test_bare_ean13_is_not_gs1():
+    assert gs1.parse("4006381333931") is None
+    assert gs1.parse("1234567890128") is None
+    assert gs1.parse("") is None and gs1.parse(None) is None
+
+
+def test_check_digit():
+    assert gs1.check_digit_ok(GTIN)
+    assert gs1.check_digit_ok("4006381333931")
+    assert gs1.check_digit_ok("96385074")
+    assert not gs1.check_digit_ok("4006381333932")
+    assert not gs1.check_digit_ok("40063813339")  # 11 digits
+    assert not gs1.check_digit_ok("400638133393A")
+    assert not gs1.check_digit_ok(None)
+
+
+def test_fields_dates():
+    out = gs1.fields(f"(01){GTIN}(17)270700(11)251399")
+    assert out["gtinValid"] is True
+    assert out["expDate"] == {"year": 2027, "month": 7, "day": None}
+    assert out["prodDate"] is None  # month 13
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from shared_code import ocr_cache
+
+OCR = {"modelVersion": "2023-10-01", "readResult": {"blocks": []}}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """In-memory work container: blob name -> (bytes, last_modified)."""
+    blobs = {}
+
+    def _props(name):
+        data, modified = blobs[name]
+        return SimpleNamespace(name=name, size=len(data), last_modified=modified)
+
+    def _upload(container, name, data, content_type=None, metadata=None):
+        blobs[name] = (data, datetime.now(timezone.utc))
+
+    monkeypatch.setattr(ocr_cache, "upload_bytes", _upload)
+    monkeypatch.setattr(ocr_cache, "download_bytes", lambda c, n: blobs[n][0])
+    monkeypatch.setattr(
+        ocr_cache, "get_properties", lambda c, n: _props(n) if n in blobs else None
+    )
+    monkeypatch.setattr(ocr_cache, "delete_blob", lambda c, n: blobs.pop(n, None))
+    monkeypatch.setattr(
+        ocr_cache,
+        "list_blobs",
+        lambda c, prefix: [_props(n) for n in blobs if n.startswith(prefix)],
+    )
+    monkeypatch.setattr(ocr_cache, "OCR_CACHE_ENABLED", True)
+    monkeypatch.setattr(ocr_cache, "OCR_CACHE_EVICT_SAMPLE", 0.0)
+    return blobs
+
+
+def _age(store, key, hours):
+    name = f"{ocr_cache.CACHE_PREFIX}{key}.json"
+    data, _ = store[name]
+    store[name] = (data, datetime.now(timezone.utc) - timedelta(hours=hours))
+
+
+def test_round_trip(store):
+    key = ocr_cache.ocr_cache_key(b"image")
+    assert ocr_cache.get_cached(key) is None
+    ocr_cache.put_cached(key, OCR)
+    assert ocr_cache.get_cached(key) == OCR
+    assert ocr_cache.ocr_cache_key(b"other") != key
+
+
+def test_errors_are_not_cached(store):
+    ocr_cache.put_cached("k1", {"error": {"code": "400", "message": "bad"}})
+    ocr_cache.put_cached("k2", {"modelVersion": "2023-10-01"})  # no readResult
+    ocr_cache.put_cached("k3", None)
+    assert store == {}
+
+
+def test_expired_entry_is_a_miss_and_removed(store, monkeypatch):
+    monkeypatch.setattr(ocr_cache, "OCR_CACHE_TTL_HOURS", 24)
+    ocr_cache.put_cached("old", OCR)
+    ocr_cache.put_cached("new", OCR)
+    _age(store, "old", 25)
+    _age(store, "new", 23)
+    assert ocr_cache.get_cached("old") is None
+    assert f"{ocr_cache.CACHE_PREFIX}old.json" not in store
+    assert ocr_cache.get_cached("new") == OCR
+
+
+def test_zero_ttl_never_expires(store, monkeypatch):
+    monkeypatch.setattr(ocr_cache, "OCR_CACHE_TTL_HOURS", 0)
+    ocr_cache.put_cached("k", OCR)
+    _age(store, "k", 10_000)
+    assert ocr_cache.get_cached("k") == OCR
+
+
+def test_evict_drops_expired_then_oldest(store, monkeypatch):
+    monkeypatch.setattr(ocr_cache, "OCR_CACHE_TTL_HOURS", 24)
+    for key, hours in (("a", 30), ("b", 5), ("c", 3), ("d", 1)):
+        ocr_cache.put_cached(key, OCR)
+        _age(store, key, hours)
+    size = len(store[f"{ocr_cache.CACHE_PREFIX}d.json"][0])
+    monkeypatch.setattr(ocr_cache, "OCR_CACHE_MAX_MB", 2.5 * size / 1024 / 1024)
+    assert ocr_cache.evict() == 2
+    assert sorted(store) == [f"{ocr_cache.CACHE_PREFIX}{k}.json" for k in "cd"]
@@ -0,0 +1,34 @@
+from shared_code import dates, ocr_index
+
+
+def _require(monkeypatch):
+    monkeypatch.setattr(ocr_index, "LABEL_PROXIMITY", "require")
+
+
+def test_other_field_line_below_is_not_near(monkeypatch, ocr_result):
+    _require(monkeypatch)
+    index = ocr_index.build_index(ocr_result("V JUL/2028", "E JUL/2027"))
+    assert ocr_index.find(index, "V JUL/2027", "expDate") is None
+    assert ocr_index.find_date(index, (2027, 7), "expDate") is None
+    assert ocr_index.find_date(index, (2027, 7), "packDate")["line"] == 1
+
+
+def test_value_on_label_line_excludes_line_below(monkeypatch, ocr_result):
+    _require(monkeypatch)
+    index = ocr_index.build_index(ocr_result("V JUL/2028", "JUL/2027"))
+    assert ocr_index.find_date(index, (2027, 7), "expDate") is None
+    assert ocr_index.find_date(index, (2028, 7), "expDate")["nearLabel"] is True
+
+
+def test_label_alone_takes_nearest_line_below(monkeypatch, ocr_result):
+    _require(monkeypatch)
+    index = ocr_index.build_index(ocr_result("VENC.", "JUL/2027", "JUL/2028"))
+    match = ocr_index.find_date(index, (2027, 7), "expDate")
+    assert match["line"] == 1 and match["nearLabel"] is True
+    assert ocr_index.find_date(index, (2028, 7), "expDate") is None
+
+
+def test_prefer_keeps_unlabelled_matches(ocr_result):
+    index = ocr_index.build_index(ocr_result("V JUL/2028", "JUL/2027"))
+    assert ocr_index.find_date(index, (2027, 7), "expDate")["nearLabel"] is False
+    assert dates.parse_month_year("V JUL/2027") == (2027, 7)
@@ -0,0 +1,50 @@
+from shared_code import roi_templates
+
+
+def _text_run(ocr_result, x: int) -> dict:
+    payload = ocr_result("L 97907")
+    payload["metadata"] = {"width": 1000, "height": 1000}
+    for point in payload["readResult"]["blocks"][0]["lines"][0]["boundingPolygon"]:
+        point["x"] += x
+    return payload
+
+
+def _barcode_run(*xs: int) -> dict:
+    return {
+        "width": 1000,
+        "height": 1000,
+        "barcodeBoxes": [[x, 500, 100, 100] for x in xs],
+    }
+
+
+def test_template_needs_enough_runs_per_region(ocr_result):
+    template = roi_templates.learn_template(
+        [_text_run(ocr_result, 0)] * 3, [_barcode_run(0)]
+    )
+    assert template["text"][2] < 0.4
+    assert template["barcode"] is None and template["barcodeCount"] is None
+    assert roi_templates.learn_template([_text_run(ocr_result, 0)] * 2, []) is None
+
+
+def test_barcode_region_holds_every_code():
+    runs = [_barcode_run(0, 600), _barcode_run(0, 600), _barcode_run(600, 0, 300)]
+    template = roi_templates.learn_template([], runs)
+    assert template["barcode"][0] == 0.0 and template["barcode"][2] >= 0.7
+    assert template["barcodeCount"] == 2
+    # Older runs recorded only barcodeBox (null when nothing was decoded)
+    legacy = [
+        _barcode_run(0),
+        _barcode_run(0),
+        {**_barcode_run(), "barcodeBoxes": [None]},
+    ]
+    template = roi_templates.learn_template([], legacy)
+    assert template is None
+
+
+def test_crop_missing_an_expected_field(ocr_result):
+    expected = {"lot": "L 97907", "expDate": "V JUN/2026", "packDate": "N/A"}
+    assert roi_templates.missing_fields(ocr_result("L 97907"), expected) == ["expDate"]
+    assert (
+        roi_templates.missing_fields(ocr_result("L 97907", "06/2026"), expected) == []
+    )
+    assert roi_templates.missing_fields({}, expected) == ["text"]
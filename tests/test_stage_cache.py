@@ -0,0 +1,53 @@
+import numpy as np
+
+from shared_code import image_codec, stage_cache
+
+PARAMS = {"clip": 2.0, "tile": 8}
+
+
+def test_key_inputs():
+    key = stage_cache.cache_key("contrast", PARAMS, "abc")
+    assert key == stage_cache.cache_key("contrast", {"tile": 8, "clip": 2.0}, "abc")
+    assert key != stage_cache.cache_key("focus", PARAMS, "abc")
+    assert key != stage_cache.cache_key("contrast", {**PARAMS, "clip": 3.0}, "abc")
+    assert key != stage_cache.cache_key("contrast", PARAMS, "abd")
+
+
+def test_key_tracks_the_work_codec(monkeypatch):
+    key = stage_cache.cache_key("bw", {}, "abc")
+    work = image_codec.CODEC_POLICY["work"]
+    monkeypatch.setitem(image_codec.CODEC_POLICY, "work", {**work, "pngCompression": 6})
+    assert stage_cache.cache_key("bw", {}, "abc") != key
+    monkeypatch.setitem(image_codec.CODEC_POLICY, "work", {**work, "format": "npy"})
+    assert stage_cache.cache_key("bw", {}, "abc") != key
+
+
+def test_hit_skips_the_transform_and_is_counted(monkeypatch):
+    written = set()
+
+    def _upload(container, stem, img):
+        written.add(f"{stem}.png")
+        return f"{stem}.png"
+
+    monkeypatch.setattr(stage_cache, "CACHE_ENABLED", True)
+    monkeypatch.setattr(stage_cache, "content_digest", lambda c, b: ("abc", b"raw"))
+    monkeypatch.setattr(
+        stage_cache, "get_properties", lambda c, n: object() if n in written else None
+    )
+    monkeypatch.setattr(stage_cache, "upload_image", _upload)
+    monkeypatch.setitem(
+        image_codec.CODEC_POLICY, "work", {"format": "png", "pngCompression": 1}
+    )
+    monkeypatch.setattr(stage_cache, "_stats", {})
+    calls = []
+
+    def _transform(raw):
+        calls.append(raw)
+        return np.zeros((2, 2), np.uint8)
+
+    ref = {"container": "input", "blobName": "uploads/a.png"}
+    miss = stage_cache.run_cached_stage(ref, "test", PARAMS, _transform)
+    hit = stage_cache.run_cached_stage(ref, "test", PARAMS, _transform)
+    assert (miss["cacheHit"], hit["cacheHit"]) == (False, True)
+    assert hit["blobName"] == miss["blobName"] and calls == [b"raw"]
+    assert stage_cache.cache_stats()["test"] == {"hits": 1, "misses": 1, "hitRate": 0.5}
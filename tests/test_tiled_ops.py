@@ -0,0 +1,29 @@
+import cv2
+import numpy as np
+
+from shared_code import tiled_ops
+
+
+def test_clahe_bands_match_full_frame_within_budget(monkeypatch):
+    rng = np.random.default_rng(0)
+    src = cv2.GaussianBlur(rng.integers(0, 256, (1003, 1501), np.uint8), (0, 0), 3)
+    expected = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(src)
+
+    peak, running = [0], [0]
+    apply = cv2.CLAHE.apply
+
+    def tracked(self, strip, *args):
+        running[0] += strip.size * tiled_ops._CLAHE_BYTES_PER_PX
+        peak[0] = max(peak[0], running[0])
+        try:
+            return apply(self, strip, *args)
+        finally:
+            running[0] -= strip.size * tiled_ops._CLAHE_BYTES_PER_PX
+
+    # 2 MB budget: a 3-tile-row band takes ~1.7 MB, so bands run one at a time
+    monkeypatch.setattr(tiled_ops, "TILE_MEMORY_MB", 2)
+    monkeypatch.setattr(cv2.CLAHE, "apply", tracked, raising=False)
+    out = tiled_ops.clahe(src, np.empty_like(src), 2.0, 8)
+
+    assert np.abs(out.astype(int) - expected).max() <= 1
+    assert 0 < peak[0] <= 2 * 1024 * 1024
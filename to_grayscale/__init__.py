@@ -1,30 +1,23 @@
-import uuid
-
-import cv2
 import numpy as np
 
-from shared_code.storage_util import download_bytes, upload_bytes
-
+from shared_code.image_codec import decode_gray
+from shared_code.stage_cache import run_cached_stage
 
-def main(ref: dict) -> dict:
-    """
-    Efficiently converts an image to grayscale.
-    """
-    raw = download_bytes(ref["container"], ref["blobName"])
 
+def _to_gray(raw: bytes) -> np.ndarray:
     # Decode the image directly to grayscale using the flag
     # cv2.IMREAD_GRAYSCALE. This is faster and uses less memory.
-    gray = cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_GRAYSCALE)
+    gray = decode_gray(raw)
 
     # If the image could not be decoded, gray will be None.
     if gray is None:
         raise RuntimeError("Could not decode image from input blob")
+    return gray
 
-    ok, buf = cv2.imencode(".png", gray)
-    if not ok:
-        raise RuntimeError("Failed to encode PNG")
 
-    out_name = f"bw/{uuid.uuid4()}.png"
-    upload_bytes("work", out_name, buf.tobytes(), "image/png")
-
-    return {"container": "work", "blobName": out_name}
+def main(ref: dict) -> dict:
+    """
+    Efficiently converts an image to grayscale.
+    Output: {"container": "work", "blobName": "bw/<key>.<ext>", "cacheHit": bool}
+    """
+    return run_cached_stage(ref, "bw", {}, _to_gray)
@@ -2,11 +2,18 @@ import json
 import logging
 import os
 
+from shared_code import dates, gs1, ocr_index
+from shared_code.claim_check import resolve
+from shared_code.fuzzy_match import best_match
+
 logger = logging.getLogger(__name__)
 
 # This is used to skip validation for specific fields
 _SENTINEL_SKIP_VALIDATION = str(os.getenv("SENTINEL_SKIP_VALIDATION", "N/A"))
 
+# Validate lot / expDate / packDate from GS1 barcode content as well as OCR
+_GS1_VALIDATION = os.getenv("GS1_VALIDATION", "true").strip().lower() == "true"
+
 
 def _safe_upper(s: str) -> str:
     return (s or "").upper()
@@ -17,25 +24,14 @@ def _norm_no_spaces(s: str) -> str:
     return "".join(_safe_upper(s).split())
 
 
-def _extract_ocr_text(ocr_result: dict) -> dict:
+def _extract_ocr_text(index: dict) -> dict:
     """
-    Flattens OCR result into two strings:
+    Flat text surfaces of the indexed OCR lines, used when a value is not
+    found within a single line (e.g. split over two lines):
     - full: all line texts joined with spaces (UPPERCASED)
     - full_ns: same but with all spaces removed (UPPERCASED)
     """
-    lines = []
-    try:
-        blocks = ocr_result.get("readResult", {}).get("blocks", [])
-        for blk in blocks:
-            for ln in blk.get("lines", []):
-                t = ln.get("text", "")
-                if t:
-                    lines.append(t)
-    except Exception as e:
-        # Fallback: if OCR structure is unexpected, log and continue with empty lines
-        logger.warning("Error extracting OCR text: %s", e)
-
-    full = " ".join(lines).upper().strip()
+    full = ocr_index.full_text(index)
     full_ns = _norm_no_spaces(full)
 
     logger.info("Extracted OCR text: '%s'", full)
@@ -51,16 +47,35 @@ def _is_sentinel(value: str | None) -> bool:
     return value.strip().upper() == _SENTINEL_SKIP_VALIDATION.upper()
 
 
-def _contains_robust(hay_full: str, hay_full_ns: str, needle: str) -> bool:
+def _best_of(hay_full: str, hay_full_ns: str, needle: str) -> dict | None:
+    """
+    Best approximate occurrence of an upper-cased needle in the OCR text,
+    as-is or with whitespace removed on both sides (fewest edits wins).
     """
-    True if needle appears in OCR with the following rules:
-    1. If needle is _SENTINEL_SKIP_VALIDATION, always return True (skip validation)
-    2. Try to find needle as-is (case-insensitive) or normalized (no spaces)
+    best = best_match(hay_full, needle)
+    if best:
+        best["surface"] = "full"
+        if best["edits"] == 0:
+            return best
+    best_ns = best_match(hay_full_ns, _norm_no_spaces(needle))
+    if best_ns and (not best or best_ns["edits"] < best["edits"]):
+        best = {**best_ns, "surface": "noSpaces"}
+    return best
+
+
+def _match_robust(hay_full: str, hay_full_ns: str, needle: str) -> dict | None:
+    """
+    Match of needle in OCR with the following rules (None if not found):
+    1. If needle is _SENTINEL_SKIP_VALIDATION, always match (skip validation)
+    2. Find needle as-is (case-insensitive) or normalized (no spaces), allowing
+       OCR confusions (0/O, 1/I, 5/S, ...) and a bounded number of edits
     3. If not found and needle contains spaces, split by spaces and search each component
        - All components must be found for validation to pass
+    The match carries the span ('start', 'end', 'text' on its 'surface') and
+    'score' (1 - edits / length); component matches report the lowest score.
     """
     if not needle:
-        return False
+        return None
 
     # Rule 1: Sentinel always validates as True
     if _is_sentinel(needle):
@@ -69,18 +84,15 @@ def _contains_robust(hay_full: str, hay_full_ns: str, needle: str) -> bool:
             _SENTINEL_SKIP_VALIDATION,
             needle,
         )
-        return True
+        return {"method": "sentinel", "score": 1.0}
 
     ndl = _safe_upper(needle).strip()
 
-    # Rule 2: Try exact match (with and without spaces)
-    if ndl and ndl in hay_full:
-        logger.debug("Exact match found for '%s'", needle)
-        return True
-
-    if _norm_no_spaces(ndl) in hay_full_ns:
-        logger.debug("Normalized match found for '%s'", needle)
-        return True
+    # Rule 2: Try the whole value (with and without spaces)
+    match = _best_of(hay_full, hay_full_ns, ndl) if ndl else None
+    if match:
+        logger.debug("Match found for '%s': %s", needle, match)
+        return {"method": "whole", **match}
 
     # Rule 3: If contains spaces, try finding all components individually
     if " " in ndl:
@@ -91,29 +103,104 @@ def _contains_robust(hay_full: str, hay_full_ns: str, needle: str) -> bool:
             needle,
         )
 
-        all_found = True
+        matches = []
         for comp in components:
-            comp_found = comp in hay_full or _norm_no_spaces(comp) in hay_full_ns
-            if not comp_found:
+            comp_match = _best_of(hay_full, hay_full_ns, comp)
+            if not comp_match:
                 logger.debug("Component '%s' NOT found", comp)
-                all_found = False
                 break
-            else:
-                logger.debug("Component '%s' found", comp)
-
-        if all_found:
+            logger.debug("Component '%s' found: %s", comp, comp_match)
+            matches.append(comp_match)
+        else:
             logger.info("All components found for '%s'", needle)
-            return True
+            return {
+                "method": "components",
+                "score": min(m["score"] for m in matches),
+                "components": matches,
+            }
 
     logger.debug("Search '%s' in OCR: False", needle)
-    return False
+    return None
+
+
+def _select_barcode(candidates: list[dict], expected_data: dict) -> int:
+    """
+    Index of the barcode to validate when several were decoded: the first
+    legible one whose content carries the expected lot (GS1 codes encode it),
+    otherwise the first legible one, otherwise 0.
+    """
+    lot = _norm_no_spaces(expected_data.get("lot", ""))
+    legible = [
+        i
+        for i, bc in enumerate(candidates)
+        if str(bc.get("decodedValue") or "").strip()
+    ]
+    if lot and not _is_sentinel(expected_data.get("lot")):
+        for i in legible:
+            if lot in _norm_no_spaces(str(candidates[i]["decodedValue"])):
+                return i
+    return legible[0] if legible else 0
+
+
+def _gs1_fields(candidates: list[dict], selected_index: int) -> dict | None:
+    """GS1 fields of the selected barcode, else of the first GS1 candidate."""
+    order = [selected_index] + [
+        i for i in range(len(candidates)) if i != selected_index
+    ]
+    for i in order:
+        parsed = gs1.fields(str(candidates[i].get("decodedValue") or ""))
+        if parsed:
+            return {**parsed, "candidateIndex": i}
+    return None
+
+
+def _lot_matches(lot: str, expected: str) -> bool:
+    """
+    True if the GS1 lot (AI 10) is the expected lot. Printed lots may carry
+    a label prefix ('S 101144'), so the last component also matches.
+    """
+    code = _norm_no_spaces(lot)
+    if not code:
+        return False
+    components = _safe_upper(expected).split()
+    return code == _norm_no_spaces(expected) or (
+        len(components) > 1 and code == components[-1]
+    )
+
+
+def _date_matches(gs1_date: dict | None, expected: str) -> bool | None:
+    """Month/year comparison; None if either side has no usable date."""
+    wanted = dates.parse_month_year(expected)
+    if not gs1_date or not wanted:
+        return None
+    return (gs1_date["year"], gs1_date["month"]) == wanted
+
+
+def _gs1_checks(parsed: dict | None, expected_data: dict) -> dict:
+    """
+    Per-field result of validating against the barcode: True/False when the
+    barcode carries the field, None when it does not (OCR must decide).
+    """
+    checks = {"lot": None, "expDate": None, "packDate": None}
+    if not parsed:
+        return checks
+    if parsed.get("lot") and expected_data.get("lot"):
+        checks["lot"] = _lot_matches(parsed["lot"], expected_data["lot"])
+    checks["expDate"] = _date_matches(
+        parsed.get("expDate"), expected_data.get("expDate")
+    )
+    checks["packDate"] = _date_matches(
+        parsed.get("prodDate"), expected_data.get("packDate")
+    )
+    return checks
 
 
 def main(payload: dict) -> dict:
     """
     Validates OCR and barcode results against expected data.
 
-    Expected payload structure from orchestrator:
+    Expected payload structure from orchestrator ("ocr" is None when the
+    orchestrator validates from the barcode alone):
     {
       "ocr": {...},
       "barcode": {"barcodeData": {...}},
@@ -128,12 +215,19 @@ def main(payload: dict) -> dict:
 
     # Extract data from payload (compatible with orchestrator output)
     ocr_container = payload.get("ocr") or {}
-    ocr_result = ocr_container.get("ocrResult") or {}
+    # The OCR payload may arrive as a claim-check reference; fetch it lazily here
+    ocr_result = resolve(ocr_container.get("ocrResult")) or {}
     barcode = payload.get("barcode") or {}
     expected_data = payload.get("expectedData") or {}
 
-    # Extract OCR text surfaces
-    ocr_text = _extract_ocr_text(ocr_result)
+    # Line index (text, boxes, trigrams, labels) and flat text surfaces
+    try:
+        index = ocr_index.build_index(ocr_result)
+    except Exception as e:
+        # Fallback: if OCR structure is unexpected, log and continue with no lines
+        logger.warning("Error indexing OCR result: %s", e)
+        index = ocr_index.build_index({})
+    ocr_text = _extract_ocr_text(index)
     full, full_ns = ocr_text["full"], ocr_text["full_ns"]
 
     # Expected fields
@@ -148,18 +242,6 @@ def main(payload: dict) -> dict:
         expected_pack_date,
     )
 
-    # Search expected values in OCR text
-    lot_ok = _contains_robust(full, full_ns, expected_lot)
-    exp_date_ok = _contains_robust(full, full_ns, expected_exp_date)
-    pack_date_ok = _contains_robust(full, full_ns, expected_pack_date)
-
-    logger.info(
-        "OCR validation: lot=%s, expDate=%s, packDate=%s",
-        lot_ok,
-        exp_date_ok,
-        pack_date_ok,
-    )
-
     # Barcode validation
     # Handle both wrapped and unwrapped barcode data
     bc_data = (
@@ -168,20 +250,87 @@ def main(payload: dict) -> dict:
         else barcode
     )
 
+    # analyze_barcode may return several codes; choose the one to validate
+    candidates = bc_data.get("barcodes") or [bc_data]
+    selected_index = _select_barcode(candidates, expected_data)
+    selected = candidates[selected_index]
+
     barcode_detected_ok = bc_data.get("barcodeDetected") is True
-    barcode_legible_ok = bc_data.get("barcodeLegible") is True
-    decoded_value = str(bc_data.get("decodedValue") or "").strip()
+    decoded_value = str(selected.get("decodedValue") or "").strip()
+    barcode_legible_ok = (
+        bc_data.get("barcodeLegible") is True
+        if selected is bc_data
+        else decoded_value != ""
+    )
 
     logger.info(
-        "Barcode: detected=%s, legible=%s, value='%s'",
+        "Barcode: detected=%s, legible=%s, value='%s' (candidate %d of %d)",
         barcode_detected_ok,
         barcode_legible_ok,
         decoded_value,
+        selected_index + 1,
+        len(candidates),
     )
 
     # barcodeOK is true only if detected AND legible AND has value
     barcode_ok = barcode_detected_ok and barcode_legible_ok and (decoded_value != "")
 
+    # GS1 codes (DataMatrix / GS1-128) carry lot (10), expiry (17) and
+    # production date (11): a field the barcode confirms needs no OCR
+    parsed = _gs1_fields(candidates, selected_index) if _GS1_VALIDATION else None
+    gs1_checks = _gs1_checks(parsed, expected_data)
+    if parsed:
+        logger.info("GS1 content: %s -> %s", parsed["elements"], gs1_checks)
+
+    fields = {
+        "lot": expected_lot,
+        "expDate": expected_exp_date,
+        "packDate": expected_pack_date,
+    }
+    field_ok, field_sources, field_matches = {}, {}, {}
+    for name, expected in fields.items():
+        if _is_sentinel(expected):
+            field_ok[name], field_sources[name] = True, "sentinel"
+        elif gs1_checks[name] is not None:
+            # The barcode carries the field: it decides, and a mismatch is a
+            # packaging defect even if the printed text matches
+            field_ok[name], field_sources[name] = gs1_checks[name], "barcode"
+            if not gs1_checks[name]:
+                logger.warning("GS1 %s does not match expected '%s'", name, expected)
+        else:
+            # Look the value up line by line (near its label when one was
+            # read); fall back to the flat text unless labels are required
+            match = ocr_index.find(index, expected, name)
+            # Dates may be printed in another format ("07/2027" for
+            # "V JUL/2027"): compare the normalised month/year
+            wanted = dates.parse_month_year(expected) if name != "lot" else None
+            if match is None and wanted:
+                match = ocr_index.find_date(index, wanted, name)
+            if match is None and not (
+                ocr_index.LABEL_PROXIMITY == "require"
+                and ocr_index.label_found(index, name)
+            ):
+                match = _match_robust(full, full_ns, expected)
+            field_matches[name] = match
+            field_ok[name] = field_matches[name] is not None
+            field_sources[name] = "ocr"
+    lot_ok, exp_date_ok, pack_date_ok = (
+        field_ok["lot"],
+        field_ok["expDate"],
+        field_ok["packDate"],
+    )
+
+    logger.info(
+        "Field validation: lot=%s, expDate=%s, packDate=%s (sources %s)",
+        lot_ok,
+        exp_date_ok,
+        pack_date_ok,
+        field_sources,
+    )
+
+    # Every field decided without OCR: the orchestrator may skip/defer it
+    barcode_settled = barcode_ok and "ocr" not in field_sources.values()
+
     # validationSummary is true only if ALL validations pass
     validation_summary = all([lot_ok, exp_date_ok, pack_date_ok, barcode_ok])
 
@@ -193,6 +342,14 @@ def main(payload: dict) -> dict:
         "barcodeLegibleOk": barcode_legible_ok,
         "barcodeOk": barcode_ok,
         "validationSummary": validation_summary,
+        # Which entry of barcodeData.barcodes was validated
+        "barcodeSelectedIndex": selected_index,
+        # Parsed GS1 content and which source validated each field
+        "gs1": parsed,
+        "fieldSources": field_sources,
+        # Best OCR span and score of each field validated from the OCR text
+        "fieldMatches": field_matches,
+        "barcodeSettled": barcode_settled,
     }
 
     logger.info(